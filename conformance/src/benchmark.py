@@ -0,0 +1,1996 @@
+"""
+Benchmarks the speed and memory use of the type checkers on the
+conformance test suite.
+"""
+
+import ast
+import contextlib
+import itertools
+import csv
+import json
+import math
+import os
+import platform
+import queue
+import random
+import re
+import statistics
+import sys
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Iterator, Mapping, Sequence
+
+import tomlkit
+
+from corpus import (
+    ScriptedEdit,
+    generate_corpus,
+    make_edits,
+    prepare_corpus_dir,
+    replicate_tests,
+)
+from daemons import DAEMONS, DmypyDaemon, LanguageServerDaemon
+from lsp import LanguageServerError
+from main import diff_expected_errors
+from options import _BenchmarkOptions, parse_benchmark_options
+from resource_usage import (
+    ResourceLimitError,
+    ResourceLimits,
+    ResourceUsage,
+    get_tree_rss,
+    measure_usage,
+)
+from snapshots import stage_type_checker
+from stats import (
+    Summary,
+    fit_linear,
+    fit_power_law,
+    mann_whitney_p,
+    percentiles,
+    summarize,
+)
+from stress import (
+    PROTOCOL_KINDS,
+    RECURSIVE_ALIAS_FORMS,
+    STRESS_FEATURES,
+    generate_overload_expansion,
+    generate_protocol_matching,
+    generate_recursive_alias,
+)
+from test_groups import get_test_cases, get_test_groups
+from type_checker import TYPE_CHECKERS, Diagnostic, TypeChecker
+
+# The metrics that are checked for regressions, with their display names
+# and units.
+_METRICS = {
+    "wall_time": ("wall time", "s"),
+    "cpu_time": ("CPU time", "s"),
+    "peak_rss_mib": ("peak memory", " MiB"),
+}
+
+# Calls whose first argument is a good place to ask a language server for
+# a hover or completions, because the test states its type.
+_QUERY_FUNCTIONS = frozenset({"reveal_type", "assert_type"})
+
+# Seconds to wait for a language server to publish diagnostics for a file.
+_LSP_TIMEOUT = 30.0
+
+# Seconds of checking, beyond the fixed cost of a run, below which a time
+# is too short to fit how it grows.
+_MIN_NET_TIME = 0.1
+
+# A module without any code, used to measure the fixed cost of a run.
+_EMPTY_MODULE = "_benchmark_empty.py"
+
+
+def time_suite_runs(
+    type_checker: TypeChecker,
+    test_cases: Sequence[Path],
+    *,
+    trials: int,
+    cache: str,
+) -> list[ResourceUsage]:
+    """
+    Runs the type checker on the test cases `trials` times and returns the
+    resources used by each run. With a "cold" cache, the type checker's
+    cache is cleared before every run. With a "warm" cache, it is filled
+    by an untimed run first and kept between runs.
+    """
+    test_files = [test_case.name for test_case in test_cases]
+    if cache == "warm":
+        type_checker.clear_cache()
+        type_checker.run_tests(test_files)
+
+    usages: list[ResourceUsage] = []
+    for _ in range(trials):
+        if cache == "cold":
+            type_checker.clear_cache()
+        with measure_usage() as usage:
+            type_checker.run_tests(test_files)
+        usages.append(usage)
+    return usages
+
+
+def make_history_entry(
+    type_checker: TypeChecker,
+    cache: str,
+    test_count: int,
+    usages: Sequence[ResourceUsage],
+) -> dict[str, Any]:
+    return {
+        **_describe_run("suite", type_checker, cache, test_count),
+        "wall_time": [round(usage.wall_time, 3) for usage in usages],
+        "cpu_time": [round(usage.user_time + usage.system_time, 3) for usage in usages],
+        "peak_rss_mib": [round(usage.peak_rss / 2**20, 1) for usage in usages],
+    }
+
+
+def _describe_run(
+    benchmark: str, type_checker: TypeChecker, cache: str, test_count: int
+) -> dict[str, Any]:
+    # The fields that identify the configuration of a benchmark run.
+    return {
+        "benchmark": benchmark,
+        "checker": type_checker.name,
+        "version": type_checker.get_version(),
+        "cache": cache,
+        "tests": test_count,
+        "host": platform.node(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def load_history(history_file: Path) -> list[dict[str, Any]]:
+    try:
+        with open(history_file, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def _get_history_file(root_dir: Path, options: _BenchmarkOptions) -> Path:
+    if options.history:
+        return Path(options.history)
+    return root_dir / "benchmarks" / "history.jsonl"
+
+
+def append_history(history_file: Path, entries: Sequence[Mapping[str, Any]]):
+    history_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_file, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def _get_corpus_dir(root_dir: Path, name: str) -> Path:
+    # Not under .cache, because pyright skips files in hidden directories,
+    # even when they are named on the command line.
+    return root_dir / "benchmarks" / "corpus" / name
+
+
+def _in_corpus(root_dir: Path, type_checker: TypeChecker, corpus_dir: Path) -> TypeChecker:
+    """
+    Returns a copy of the type checker that runs in a generated corpus and
+    keeps its caches outside it, so that regenerating the corpus does not
+    pick them up as files to check.
+    """
+    cache_dir = root_dir / "benchmarks" / "cache" / corpus_dir.name / type_checker.name
+    return type_checker.with_directories(corpus_dir, cache_dir)
+
+
+def get_previous_version(
+    history: Sequence[Mapping[str, Any]], entry: Mapping[str, Any]
+) -> tuple[str, list[Mapping[str, Any]]] | None:
+    """
+    Finds the most recently benchmarked version of the type checker other
+    than the entry's version, among runs of the same benchmark with the
+    same configuration on the same host. Returns that version and its
+    entries, or None if there is no such version.
+    """
+    comparable = [
+        past
+        for past in history
+        if all(
+            past.get(key) == entry[key]
+            for key in ("benchmark", "checker", "cache", "tests", "host")
+        )
+    ]
+    previous_versions = [
+        past["version"] for past in comparable if past["version"] != entry["version"]
+    ]
+    if not previous_versions:
+        return None
+
+    version = previous_versions[-1]
+    return version, [past for past in comparable if past["version"] == version]
+
+
+def get_baseline(
+    history: Sequence[Mapping[str, Any]], entry: Mapping[str, Any]
+) -> tuple[str, dict[str, list[float]]] | None:
+    """
+    Returns the previous version of the type checker and all of its
+    samples, pooled over its runs, or None if there is no such version.
+    """
+    previous = get_previous_version(history, entry)
+    if previous is None:
+        return None
+
+    version, entries = previous
+    samples: dict[str, list[float]] = {}
+    for past in entries:
+        for metric in _METRICS:
+            samples.setdefault(metric, []).extend(past.get(metric, []))
+    return version, samples
+
+
+def find_regressions(
+    entry: Mapping[str, Any],
+    baseline_version: str,
+    baseline: Mapping[str, Sequence[float]],
+    *,
+    alpha: float,
+    threshold: float,
+) -> list[str]:
+    """
+    Compares the samples of an entry with those of the previous version.
+    A metric has regressed if its samples are significantly larger
+    according to a Mann-Whitney U test, and its median has grown by more
+    than `threshold` (as a fraction), so that tiny but consistent changes
+    are not reported.
+    """
+    regressions: list[str] = []
+    for metric, (label, unit) in _METRICS.items():
+        baseline_samples = baseline.get(metric)
+        samples = entry[metric]
+        if not baseline_samples or not samples:
+            continue
+        old = summarize(baseline_samples).median
+        new = summarize(samples).median
+        if old <= 0 or new <= old * (1 + threshold):
+            continue
+        p_value = mann_whitney_p(baseline_samples, samples)
+        if p_value < alpha:
+            regressions.append(
+                f"{label} median {new:.2f}{unit} is {new / old - 1:.0%} higher than "
+                f"{old:.2f}{unit} for {baseline_version} (p = {p_value:.3f})"
+            )
+    return regressions
+
+
+def print_entry(entry: Mapping[str, Any]):
+    print(
+        f"{entry['version']}, {entry['cache']} cache "
+        f"({len(entry['wall_time'])} runs of {entry['tests']} tests)"
+    )
+    for metric, (label, unit) in _METRICS.items():
+        summary = summarize(entry[metric])
+        print(
+            f"  {label}: median {summary.median:.2f}{unit}, "
+            f"IQR {summary.iqr:.2f}{unit}, min {summary.min:.2f}{unit}"
+        )
+
+
+def benchmark_suite(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    test_cases: Sequence[Path],
+    options: _BenchmarkOptions,
+) -> bool:
+    """
+    Benchmarks each type checker on the test suite, appends the results to
+    the history file and reports regressions against the previous version.
+    Returns True if any regression was found.
+    """
+    history_file = _get_history_file(root_dir, options)
+    history = load_history(history_file)
+    caches = ["cold", "warm"] if options.cache == "both" else [options.cache]
+
+    found_regression = False
+    for type_checker in type_checkers:
+        if not type_checker.install():
+            print(f"Skipping benchmark for {type_checker.name}")
+            continue
+
+        entries: list[dict[str, Any]] = []
+        for cache in caches:
+            print(f"Benchmarking {type_checker.name} with a {cache} cache")
+            usages = time_suite_runs(
+                type_checker, test_cases, trials=options.trials, cache=cache
+            )
+            entry = make_history_entry(type_checker, cache, len(test_cases), usages)
+            print_entry(entry)
+
+            baseline = get_baseline(history, entry)
+            if baseline is not None:
+                regressions = find_regressions(
+                    entry,
+                    *baseline,
+                    alpha=options.alpha,
+                    threshold=options.threshold,
+                )
+                for regression in regressions:
+                    print(f"  Regression: {regression}")
+                found_regression = found_regression or bool(regressions)
+            entries.append(entry)
+
+        append_history(history_file, entries)
+        history.extend(entries)
+
+    return found_regression
+
+
+@contextlib.contextmanager
+def empty_module(tests_dir: Path) -> Iterator[str]:
+    """
+    Creates an empty module in the tests directory for the duration of the
+    context, and returns its file name.
+    """
+    path = tests_dir / _EMPTY_MODULE
+    path.write_text("")
+    try:
+        yield path.name
+    finally:
+        path.unlink(missing_ok=True)
+
+
+def _time_run(type_checker: TypeChecker, test_files: Sequence[str]) -> float:
+    with measure_usage(current_thread_only=True) as usage:
+        type_checker.run_tests(test_files)
+    if not usage.processes:
+        # CPU times are not available on this platform.
+        return usage.wall_time
+    return usage.user_time + usage.system_time
+
+
+def time_files(
+    type_checkers: Sequence[TypeChecker],
+    test_files: Sequence[str],
+    *,
+    trials: int,
+    jobs: int,
+    warm_up: Sequence[str] = (),
+) -> dict[str, dict[str, float]]:
+    """
+    Runs each type checker on each file in isolation `trials` times, with
+    up to `jobs` runs at once. Returns the median CPU time of the runs in
+    seconds, keyed by type checker name and file name. CPU time is used
+    rather than wall time, as it is less affected by the concurrent runs.
+    Runs of a type checker that overlap never share a cache, and each
+    cache is first filled by running on the `warm_up` files.
+    """
+    pools: dict[str, queue.SimpleQueue[TypeChecker]] = {}
+    with ThreadPoolExecutor(jobs) as executor:
+        copies: list[TypeChecker] = []
+        for type_checker in type_checkers:
+            assert type_checker.working_dir is not None
+            assert type_checker.cache_dir is not None
+            pools[type_checker.name] = queue.SimpleQueue()
+            for job in range(jobs):
+                copy = type_checker.with_directories(
+                    type_checker.working_dir, type_checker.cache_dir / f"job{job}"
+                )
+                pools[type_checker.name].put(copy)
+                copies.append(copy)
+        if warm_up:
+            for future in [executor.submit(copy.run_tests, warm_up) for copy in copies]:
+                future.result()
+
+        def time_run(name: str, test_file: str) -> float:
+            # There are as many copies of each type checker as workers, so
+            # one is always free.
+            type_checker = pools[name].get()
+            try:
+                return _time_run(type_checker, [test_file])
+            finally:
+                pools[name].put(type_checker)
+
+        # Interleave the type checkers, so that each one sees the same
+        # load from the others.
+        futures = {
+            (type_checker.name, test_file): [
+                executor.submit(time_run, type_checker.name, test_file)
+                for _ in range(trials)
+            ]
+            for test_file in test_files
+            for type_checker in type_checkers
+        }
+        times: dict[str, dict[str, float]] = {}
+        for (name, test_file), trial_futures in futures.items():
+            times.setdefault(name, {})[test_file] = statistics.median(
+                future.result() for future in trial_futures
+            )
+    return times
+
+
+def update_file_times(
+    root_dir: Path,
+    type_checker: TypeChecker,
+    trials: int,
+    baseline: float,
+    file_times: Mapping[str, float],
+):
+    """
+    Records the time taken for each test file in the type checker's
+    perf.toml, where the report picks it up. The times are kept until the
+    type checker's version changes.
+    """
+    perf_file = root_dir / "results" / type_checker.name / "perf.toml"
+    try:
+        with open(perf_file, "r", encoding="utf-8") as f:
+            perf_info = tomlkit.load(f)
+    except FileNotFoundError:
+        perf_info = tomlkit.document()
+
+    perf_info["file_times"] = {
+        "version": type_checker.get_version(),
+        "trials": trials,
+        "baseline_ms": round(baseline * 1000, 1),
+        "tests": {
+            Path(test_file).stem: round(time * 1000, 1)
+            for test_file, time in sorted(file_times.items())
+        },
+    }
+
+    perf_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(perf_file, "w", encoding="utf-8") as f:
+        tomlkit.dump(perf_info, f)
+
+
+def write_file_times_csv(csv_file: Path, file_times: Mapping[str, Mapping[str, float]]):
+    """
+    Writes a matrix of the time in milliseconds taken for each test file
+    (rows) by each type checker (columns).
+    """
+    names = sorted(file_times)
+    test_files = sorted({test_file for times in file_times.values() for test_file in times})
+
+    csv_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(csv_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["test", *names])
+        for test_file in test_files:
+            writer.writerow(
+                [
+                    Path(test_file).stem,
+                    *(
+                        f"{file_times[name][test_file] * 1000:.1f}"
+                        if test_file in file_times[name]
+                        else ""
+                        for name in names
+                    ),
+                ]
+            )
+
+
+def benchmark_files(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    test_cases: Sequence[Path],
+    options: _BenchmarkOptions,
+):
+    """
+    Times each test file in isolation with each type checker, less the
+    time taken for an empty module, so that the files that are expensive
+    to check stand out.
+    """
+    type_checkers = [type_checker for type_checker in type_checkers if type_checker.install()]
+    if not type_checkers:
+        return
+    test_files = [test_case.name for test_case in test_cases]
+
+    with contextlib.ExitStack() as stack:
+        for type_checker in type_checkers:
+            assert type_checker.working_dir is not None
+            empty_file = stack.enter_context(empty_module(type_checker.working_dir))
+
+        print(
+            f"Timing {len(test_files)} files with {len(type_checkers)} type checkers "
+            f"({options.trials} runs each, {options.jobs} at a time)"
+        )
+        # Fill any caches for the standard library first, so that every
+        # timed run starts from the same state.
+        times = time_files(
+            type_checkers,
+            [empty_file, *test_files],
+            trials=options.trials,
+            jobs=options.jobs,
+            warm_up=[empty_file],
+        )
+
+    file_times: dict[str, dict[str, float]] = {}
+    for type_checker in type_checkers:
+        baseline = times[type_checker.name].pop(empty_file)
+        file_times[type_checker.name] = {
+            test_file: max(0.0, time - baseline)
+            for test_file, time in times[type_checker.name].items()
+        }
+        update_file_times(
+            root_dir, type_checker, options.trials, baseline, file_times[type_checker.name]
+        )
+
+        slowest = sorted(
+            file_times[type_checker.name].items(), key=lambda item: item[1], reverse=True
+        )[:5]
+        print(f"{type_checker.name}: {baseline * 1000:.0f} ms for an empty module, slowest files:")
+        for test_file, time in slowest:
+            print(f"  {test_file}: +{time * 1000:.0f} ms")
+
+    csv_file = Path(options.csv) if options.csv else root_dir / "benchmarks" / "file_times.csv"
+    write_file_times_csv(csv_file, file_times)
+    print(f"Wrote {csv_file}")
+
+
+def _time_wall(function: Callable[..., object], *args: Any) -> float:
+    with measure_usage() as usage:
+        function(*args)
+    return usage.wall_time
+
+
+def get_corpus_sizes(test_count: int, steps: int) -> list[int]:
+    """
+    Returns the numbers of test files to time a type checker on: none (an
+    empty module), and `steps` evenly spaced sizes up to all of them.
+    """
+    return [
+        0,
+        *sorted(
+            {max(1, round(test_count * step / steps)) for step in range(1, steps + 1)}
+        ),
+    ]
+
+
+def print_startup_entry(
+    entry: Mapping[str, Any],
+    previous: tuple[str, Sequence[Mapping[str, Any]]] | None,
+):
+    print(
+        f"{entry['version']}, {entry['cache']} cache "
+        f"({len(entry['version_time'])} runs of 0 to {entry['tests']} tests)"
+    )
+    print(f"  --version: median {statistics.median(entry['version_time']):.2f}s")
+    for size, times in zip(entry["sizes"], entry["wall_time"]):
+        label = f"{size} tests" if size else "empty module"
+        print(f"  {label}: median {statistics.median(times):.2f}s")
+    print(
+        f"  fit: {entry['fixed_time']:.2f}s fixed + "
+        f"{entry['per_file_time'] * 1000:.1f} ms per file (R² {entry['r_squared']:.2f})"
+    )
+
+    if previous is None:
+        return
+    version, entries = previous
+    old_fixed = statistics.median(past["fixed_time"] for past in entries)
+    old_per_file = statistics.median(past["per_file_time"] for past in entries)
+    print(
+        f"  compared with {version}: "
+        f"fixed cost {old_fixed:.2f}s -> {entry['fixed_time']:.2f}s "
+        f"({_relative_change(old_fixed, entry['fixed_time'])}), "
+        f"cost per file {old_per_file * 1000:.1f} ms -> {entry['per_file_time'] * 1000:.1f} ms "
+        f"({_relative_change(old_per_file, entry['per_file_time'])})"
+    )
+
+
+def _relative_change(old: float, new: float) -> str:
+    if old <= 0:
+        return "n/a"
+    return f"{new / old - 1:+.0%}"
+
+
+def benchmark_startup(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    test_cases: Sequence[Path],
+    options: _BenchmarkOptions,
+):
+    """
+    Splits the run time of each type checker into a fixed cost, such as
+    starting the interpreter and loading typeshed, and a cost per test
+    file. The type checker is timed on `--version`, on an empty module and
+    on growing parts of the test suite, and a line is fitted to the times.
+    A slower fixed cost affects editor and pre-commit latency, while a
+    slower cost per file affects checking large projects.
+    """
+    history_file = _get_history_file(root_dir, options)
+    history = load_history(history_file)
+
+    # Take the parts of the test suite from a fixed shuffle of the test
+    # files, so that each part is a representative sample.
+    test_files = sorted(test_case.name for test_case in test_cases)
+    random.Random(0).shuffle(test_files)
+    sizes = get_corpus_sizes(len(test_files), options.steps)
+
+    for type_checker in type_checkers:
+        if not type_checker.install():
+            print(f"Skipping benchmark for {type_checker.name}")
+            continue
+
+        print(f"Measuring the startup cost of {type_checker.name}")
+        if options.cache == "warm":
+            type_checker.clear_cache()
+            type_checker.run_tests(test_files)
+
+        version_times: list[float] = []
+        size_times: list[list[float]] = [[] for _ in sizes]
+        assert type_checker.working_dir is not None
+        with empty_module(type_checker.working_dir) as empty_file:
+            # Time every size in each trial, so that any drift in the speed
+            # of the machine affects all of them alike.
+            for _ in range(options.trials):
+                version_times.append(_time_wall(type_checker.get_version))
+                for times, size in zip(size_times, sizes):
+                    if options.cache == "cold":
+                        type_checker.clear_cache()
+                    times.append(
+                        _time_wall(type_checker.run_tests, test_files[:size] or [empty_file])
+                    )
+
+        fit = fit_linear(
+            [size for size, times in zip(sizes, size_times) for _ in times],
+            [time for times in size_times for time in times],
+        )
+        entry = {
+            **_describe_run("startup", type_checker, options.cache, len(test_files)),
+            "version_time": [round(time, 3) for time in version_times],
+            "sizes": sizes,
+            "wall_time": [[round(time, 3) for time in times] for times in size_times],
+            "fixed_time": round(fit.intercept, 4),
+            "per_file_time": round(fit.slope, 5),
+            "r_squared": round(fit.r_squared, 4),
+        }
+        print_startup_entry(entry, get_previous_version(history, entry))
+
+        append_history(history_file, [entry])
+        history.append(entry)
+
+
+def get_thread_counts(max_threads: int) -> list[int]:
+    """
+    Returns the powers of two below `max_threads`, followed by `max_threads`.
+    """
+    thread_counts: list[int] = []
+    count = 1
+    while count < max_threads:
+        thread_counts.append(count)
+        count *= 2
+    thread_counts.append(max(1, max_threads))
+    return thread_counts
+
+
+def print_thread_entry(entry: Mapping[str, Any]):
+    print(f"{entry['version']} on {entry['corpus']} ({entry['tests']} files)")
+    print("  threads   median  speedup  efficiency")
+    medians = [statistics.median(times) for times in entry["wall_time"]]
+    for threads, median in zip(entry["threads"], medians):
+        speedup = medians[0] / median if median > 0 else 0.0
+        print(f"  {threads:7}  {median:6.2f}s  {speedup:6.2f}x  {speedup / threads:9.0%}")
+
+
+def benchmark_threads(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    test_cases: Sequence[Path],
+    options: _BenchmarkOptions,
+):
+    """
+    Times each type checker that can use several threads with 1, 2, 4, ...
+    threads, on the test suite and on a larger corpus made of copies of
+    the test suite. Reports the speedup and efficiency relative to a
+    single thread, which shows how many CPUs are worth giving to CI runs.
+    """
+    history_file = _get_history_file(root_dir, options)
+    type_checkers = [type_checker for type_checker in type_checkers if type_checker.supports_threads]
+    thread_counts = get_thread_counts(options.max_threads)
+
+    corpus_dir = _get_corpus_dir(root_dir, f"copies-{options.copies}")
+    corpora = [
+        ("the test suite", None, [test_case.name for test_case in test_cases]),
+        (
+            f"{options.copies} copies of the test suite",
+            corpus_dir,
+            replicate_tests(root_dir / "tests", test_cases, corpus_dir, options.copies),
+        ),
+    ]
+
+    for type_checker in type_checkers:
+        if not type_checker.install():
+            print(f"Skipping benchmark for {type_checker.name}")
+            continue
+
+        for corpus_name, directory, test_files in corpora:
+            print(f"Timing {type_checker.name} on {corpus_name} with up to {thread_counts[-1]} threads")
+            # The test suite is checked in the snapshot of the type checker.
+            runner = type_checker
+            if directory is not None:
+                runner = _in_corpus(root_dir, type_checker, directory)
+            # Read the files once, so that the first timed run does not
+            # pay for loading them from disk.
+            runner.run_tests(test_files)
+
+            size_times: list[list[float]] = []
+            for threads in thread_counts:
+                runner.threads = threads
+                size_times.append(
+                    [_time_wall(runner.run_tests, test_files) for _ in range(options.trials)]
+                )
+            runner.threads = None
+
+            entry = {
+                **_describe_run("threads", type_checker, "none", len(test_files)),
+                "corpus": corpus_name,
+                "threads": thread_counts,
+                "wall_time": [[round(time, 3) for time in times] for times in size_times],
+            }
+            print_thread_entry(entry)
+            append_history(history_file, [entry])
+
+
+def time_edits(
+    run_tests: Callable[[Sequence[str]], object],
+    edits: Sequence[ScriptedEdit],
+    iterations: int,
+    daemon: LanguageServerDaemon | None = None,
+) -> dict[str, list[float]]:
+    """
+    Makes each edit `iterations` times and returns, for each kind of edit,
+    the seconds from the edit until the type checker reported diagnostics
+    for the affected files. For a language server, this is the time when
+    it last published diagnostics, which does not include the quiet period
+    that `run_tests` waits for afterwards.
+    """
+    latencies: dict[str, list[float]] = {edit.kind: [] for edit in edits}
+    for iteration in range(1, iterations + 1):
+        for edit in edits:
+            edit.apply(iteration)
+            start = perf_counter()
+            run_tests(edit.affected)
+            end = perf_counter()
+            published = daemon.last_publish_time if daemon is not None else None
+            if published is not None and published > start:
+                end = published
+            latencies[edit.kind].append(end - start)
+    return latencies
+
+
+def print_edit_entry(entry: Mapping[str, Any]):
+    print(f"{entry['version']}, {entry['backend']} ({entry['iterations']} edits of each kind)")
+    for kind, times in entry["latency"].items():
+        print(f"  {kind}: {_format_latencies(times)}")
+
+
+def _format_latencies(times: Sequence[float]) -> str:
+    p50, p90, p99 = percentiles(times, (50, 90, 99))
+    return (
+        f"p50 {p50 * 1000:.0f} ms, p90 {p90 * 1000:.0f} ms, "
+        f"p99 {p99 * 1000:.0f} ms (min {min(times) * 1000:.0f} ms, "
+        f"max {max(times) * 1000:.0f} ms)"
+    )
+
+
+def benchmark_edits(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    test_cases: Sequence[Path],
+    options: _BenchmarkOptions,
+):
+    """
+    Measures how long each warm type checker takes to report fresh
+    diagnostics after an edit, which is what a user waits for in an editor
+    or a watch loop. Three kinds of edit are made: to a function body in a
+    test file, to a function signature in a helper module that other tests
+    import, and to a stub that other tests import. Mypy is timed both as
+    incremental runs that keep its cache and with its daemon, the type
+    checkers with a language server through the server, and the others as
+    batch runs of the affected files.
+    """
+    history_file = _get_history_file(root_dir, options)
+    test_files = [test_case.name for test_case in test_cases]
+    if options.file not in test_files:
+        raise SystemExit(f"{options.file} is not one of the test files")
+
+    # Edit a copy of the tests, so that an interrupted run leaves the
+    # tests directory untouched.
+    corpus_dir = _get_corpus_dir(root_dir, "edits")
+    replicate_tests(root_dir / "tests", test_cases, corpus_dir, 1)
+
+    edits = make_edits(corpus_dir, options.file)
+    for type_checker in type_checkers:
+        if not type_checker.install():
+            print(f"Skipping benchmark for {type_checker.name}")
+            continue
+        type_checker = _in_corpus(root_dir, type_checker, corpus_dir)
+
+        daemon_class = DAEMONS.get(type_checker.name)
+        backends: list[str] = []
+        if type_checker.name == "mypy":
+            backends.append("incremental")
+        if daemon_class is not None:
+            backends.append("daemon")
+        else:
+            backends.append("batch")
+
+        for backend in backends:
+            print(f"Timing edits with {type_checker.name} ({backend})")
+            # Start every run from the same contents, with the first
+            # edit made, so that the first timed edit is a change.
+            for edit in edits:
+                edit.apply(0)
+
+            if backend == "daemon":
+                assert daemon_class is not None
+                daemon = daemon_class(type_checker)
+                daemon.start()
+                if isinstance(daemon, LanguageServerDaemon) and daemon.failed:
+                    # The batch command would be timed instead.
+                    print(f"Skipping the language server of {type_checker.name}")
+                    continue
+                try:
+                    daemon.run_tests(test_files)
+                    latencies = time_edits(
+                        daemon.run_tests,
+                        edits,
+                        options.iterations,
+                        daemon if isinstance(daemon, LanguageServerDaemon) else None,
+                    )
+                finally:
+                    daemon.stop()
+                    if isinstance(daemon, DmypyDaemon):
+                        daemon.stop_server()
+            elif backend == "incremental":
+                # Rechecking everything with a warm cache is how mypy is
+                # used after an edit without its daemon.
+                type_checker.clear_cache()
+                type_checker.run_tests(test_files)
+                latencies = time_edits(
+                    lambda _: type_checker.run_tests(test_files),
+                    edits,
+                    options.iterations,
+                )
+            else:
+                type_checker.run_tests(test_files)
+                latencies = time_edits(type_checker.run_tests, edits, options.iterations)
+
+            entry = {
+                **_describe_run("edits", type_checker, "warm", len(test_files)),
+                "backend": backend,
+                "iterations": options.iterations,
+                "latency": {
+                    kind: [round(time, 4) for time in times]
+                    for kind, times in latencies.items()
+                },
+            }
+            print_edit_entry(entry)
+            append_history(history_file, [entry])
+
+    for edit in edits:
+        edit.revert()
+
+
+def get_query_sites(source: str, max_sites: int) -> list[tuple[int, int, int]]:
+    """
+    Returns the positions of the first argument of the reveal_type and
+    assert_type calls in a test file, as (line, start, end) tuples that
+    are zero-based and count UTF-16 code units, like LSP positions. If
+    there are more than `max_sites` calls, evenly spaced ones are chosen.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return []
+    lines = source.splitlines()
+
+    sites: list[tuple[int, int, int]] = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call) or not node.args:
+            continue
+        if isinstance(node.func, ast.Name):
+            name = node.func.id
+        elif isinstance(node.func, ast.Attribute):
+            name = node.func.attr
+        else:
+            continue
+        argument = node.args[0]
+        if name not in _QUERY_FUNCTIONS or argument.end_lineno != argument.lineno:
+            continue
+        assert argument.end_col_offset is not None
+        line = lines[argument.lineno - 1].encode("utf-8")
+        sites.append(
+            (
+                argument.lineno - 1,
+                _utf16_length(line[: argument.col_offset]),
+                _utf16_length(line[: argument.end_col_offset]),
+            )
+        )
+
+    sites.sort()
+    if len(sites) > max_sites:
+        sites = [sites[index * len(sites) // max_sites] for index in range(max_sites)]
+    return sites
+
+
+def _utf16_length(text: bytes) -> int:
+    # ast column offsets count UTF-8 bytes.
+    return len(text.decode("utf-8").encode("utf-16-le")) // 2
+
+
+def _time_request(times: list[float], request: Callable[..., object], *args: Any):
+    """
+    Times a language server request and appends the time to `times`. A
+    request that the server cancels, for example because it is still
+    processing a file that was just opened, is retried once.
+    """
+    for attempt in range(2):
+        start = perf_counter()
+        try:
+            request(*args, timeout=_LSP_TIMEOUT)
+        except LanguageServerError:
+            if attempt:
+                raise
+        else:
+            times.append(perf_counter() - start)
+            return
+
+
+def print_lsp_entry(entry: Mapping[str, Any]):
+    print(
+        f"{entry['version']}, {entry['tests']} files open: "
+        f"started in {entry['startup_time'] * 1000:.0f} ms, "
+        f"using {entry['rss_mib']:.0f} MiB"
+    )
+    for key, label in (
+        ("first_diagnostics", "first diagnostics"),
+        ("hover", "hover"),
+        ("completion", "completion"),
+    ):
+        if entry[key]:
+            print(f"  {label}: {_format_latencies(entry[key])}")
+    if entry["missing_diagnostics"]:
+        print(
+            f"  no diagnostics within {_LSP_TIMEOUT:.0f}s for "
+            + ", ".join(entry["missing_diagnostics"])
+        )
+
+
+def benchmark_lsp(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    test_cases: Sequence[Path],
+    options: _BenchmarkOptions,
+):
+    """
+    Measures the responsiveness of the type checkers that have a language
+    server, as a user of an editor would feel it. Each test file is opened
+    in turn, and the time until the server first publishes (or returns)
+    its diagnostics is recorded. Hovers and completions are then requested
+    at the reveal_type and assert_type calls of the file. Once every file
+    is open, the memory used by the server and its child processes is
+    recorded.
+    """
+    history_file = _get_history_file(root_dir, options)
+    test_files = [test_case.name for test_case in test_cases]
+
+    for type_checker in type_checkers:
+        daemon_class = DAEMONS.get(type_checker.name)
+        if daemon_class is None or not issubclass(daemon_class, LanguageServerDaemon):
+            continue
+        if not type_checker.install():
+            print(f"Skipping benchmark for {type_checker.name}")
+            continue
+
+        print(f"Timing the language server of {type_checker.name}")
+        daemon = daemon_class(type_checker)
+        diagnostic_times: list[float] = []
+        hover_times: list[float] = []
+        completion_times: list[float] = []
+        missing_diagnostics: list[str] = []
+        startup_time = _time_wall(daemon.start)
+        if daemon.failed:
+            print(f"Skipping benchmark for {type_checker.name}")
+            continue
+        try:
+            client = daemon.client
+            for test_file in test_files:
+                path = (daemon.root_dir / test_file).resolve()
+                published_after = client.get_publish_count(path)
+                start = perf_counter()
+                client.open_document(path)
+                try:
+                    client.get_diagnostics(
+                        path, published_after=published_after, timeout=_LSP_TIMEOUT
+                    )
+                    diagnostic_times.append(perf_counter() - start)
+                except TimeoutError:
+                    # Some servers occasionally never publish diagnostics for
+                    # a file. Count these rather than giving up on the server.
+                    missing_diagnostics.append(test_file)
+
+                source = path.read_text(encoding="utf-8")
+                for line, start_character, end_character in get_query_sites(
+                    source, options.max_sites
+                ):
+                    _time_request(
+                        hover_times, client.hover, path, line, start_character
+                    )
+                    # Completing at the end of the expression lists the names
+                    # that start with it, or the members of its left operand.
+                    _time_request(
+                        completion_times, client.completion, path, line, end_character
+                    )
+
+            assert client.pid is not None
+            rss = get_tree_rss(client.pid)
+        finally:
+            daemon.stop()
+
+        entry = {
+            **_describe_run("lsp", type_checker, "none", len(test_files)),
+            "startup_time": round(startup_time, 3),
+            "first_diagnostics": [round(time, 4) for time in diagnostic_times],
+            "hover": [round(time, 4) for time in hover_times],
+            "completion": [round(time, 4) for time in completion_times],
+            "missing_diagnostics": missing_diagnostics,
+            "rss_mib": round(rss / 2**20, 1),
+        }
+        print_lsp_entry(entry)
+        append_history(history_file, [entry])
+
+
+def get_errors_diffs(
+    root_dir: Path,
+    type_checker: TypeChecker,
+    output: Mapping[str, Sequence[Diagnostic]],
+    templates: Mapping[Path, Path],
+) -> dict[Path, str]:
+    """
+    Scores the output of a type checker on test files made from the test
+    cases in `templates`, as the harness would score the test cases
+    themselves, and returns the differences from the expected errors.
+    """
+    results_dir = root_dir / "results" / type_checker.name
+    diffs: dict[Path, str] = {}
+    for test_file, template in templates.items():
+        try:
+            with open(results_dir / f"{template.stem}.toml", "rb") as f:
+                ignored_errors = tomllib.load(f).get("ignore_errors", [])
+        except FileNotFoundError:
+            ignored_errors = []
+        diffs[test_file] = diff_expected_errors(
+            type_checker, test_file, output.get(test_file.name, []), ignored_errors
+        )
+    return diffs
+
+
+def _without_messages(errors_diff: str) -> list[str]:
+    # The messages mention the file and symbol names, which differ in the
+    # generated files, so only compare the lines with differences.
+    return [
+        re.sub(r": Unexpected errors .*", ": Unexpected errors", line)
+        for line in errors_diff.splitlines()
+    ]
+
+
+def print_scale_entry(entry: Mapping[str, Any]):
+    wall_time = statistics.median(entry["wall_time"])
+    print(
+        f"  {entry['scale']}x ({entry['tests']} files): {wall_time:.1f}s, "
+        f"{entry['tests'] / wall_time:.0f} files/s, "
+        f"{statistics.median(entry['peak_rss_mib']):.0f} MiB, "
+        f"{entry['agreement']:.1%} scored like the test cases"
+    )
+
+
+def benchmark_scale(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    test_cases: Sequence[Path],
+    options: _BenchmarkOptions,
+):
+    """
+    Times each type checker with a cold cache on corpora generated from
+    the test cases at each of the given scales, and reports how many files
+    per second it checks and how its memory use grows with the size of
+    the corpus. The generated files are also scored against their "# E"
+    comments, and the share of them that get the same score as the test
+    case they were made from is reported, as a check that the type checker
+    treats the corpus like the test suite.
+    """
+    history_file = _get_history_file(root_dir, options)
+    test_files = [test_case.name for test_case in test_cases]
+
+    type_checkers = [type_checker for type_checker in type_checkers if type_checker.install()]
+    expected_diffs: dict[str, dict[str, str]] = {}
+    for type_checker in type_checkers:
+        print(f"Scoring {type_checker.name} on the test cases")
+        diffs = get_errors_diffs(
+            root_dir,
+            type_checker,
+            type_checker.run_tests(test_files),
+            {test_case: test_case for test_case in test_cases},
+        )
+        expected_diffs[type_checker.name] = {
+            test_case.name: diff for test_case, diff in diffs.items()
+        }
+
+    entries: dict[str, list[dict[str, Any]]] = {
+        type_checker.name: [] for type_checker in type_checkers
+    }
+    for scale in options.scales:
+        # Only one corpus is kept on disk at a time, as the largest ones
+        # take up a lot of space.
+        corpus_dir = _get_corpus_dir(root_dir, "scale")
+        print(f"Generating {scale} copies of the test suite ({options.shape} imports)")
+        corpus = generate_corpus(
+            root_dir / "tests", test_cases, corpus_dir, scale, shape=options.shape
+        )
+        templates = {
+            corpus_dir / test_file: template
+            for test_file, template in corpus.templates.items()
+        }
+
+        for type_checker in type_checkers:
+            print(f"Timing {type_checker.name} on {len(templates)} files")
+            usages: list[ResourceUsage] = []
+            runner = _in_corpus(root_dir, type_checker, corpus_dir)
+            for _ in range(options.trials):
+                runner.clear_cache()
+                with measure_usage() as usage:
+                    output = runner.run_tests(corpus.packages)
+                usages.append(usage)
+            runner.clear_cache()
+
+            diffs = get_errors_diffs(root_dir, type_checker, output, templates)
+            checker_diffs = expected_diffs[type_checker.name]
+            agreeing = sum(
+                _without_messages(diff)
+                == _without_messages(checker_diffs[templates[test_file].name])
+                for test_file, diff in diffs.items()
+            )
+            entry = {
+                **make_history_entry(type_checker, "cold", len(templates), usages),
+                "benchmark": "scale",
+                "scale": scale,
+                "shape": options.shape,
+                "agreement": round(agreeing / len(templates), 4),
+            }
+            print_scale_entry(entry)
+            append_history(history_file, [entry])
+            entries[type_checker.name].append(entry)
+
+    for type_checker in type_checkers:
+        checker_entries = entries[type_checker.name]
+        print(f"{type_checker.name}:")
+        for entry in checker_entries:
+            print_scale_entry(entry)
+        if len(checker_entries) >= 2:
+            fit = fit_linear(
+                [entry["tests"] for entry in checker_entries],
+                [statistics.median(entry["peak_rss_mib"]) for entry in checker_entries],
+            )
+            print(
+                f"  memory: {fit.intercept:.0f} MiB + {fit.slope * 1000:.1f} MiB "
+                f"per 1000 files (R² {fit.r_squared:.2f})"
+            )
+
+
+def fit_growth(sizes: Sequence[int], times: Sequence[float]) -> dict[str, Any] | None:
+    """
+    Fits a power law to how the times grow with the sizes, leaving out
+    times too short to measure reliably. Besides the exponent of the fit,
+    returns the exponent between the two largest sizes, which shows where
+    the growth is heading: it stays level for polynomial growth and keeps
+    rising for exponential growth. Returns None if fewer than two sizes
+    took long enough.
+    """
+    points = [(size, time) for size, time in zip(sizes, times) if time >= _MIN_NET_TIME]
+    if len(points) < 2:
+        return None
+    fit = fit_power_law([size for size, _ in points], [time for _, time in points])
+    (last_size, last_time), (size, time) = points[-2:]
+    return {
+        "exponent": round(fit.slope, 3),
+        "r_squared": round(fit.r_squared, 4),
+        "final_exponent": round(math.log(time / last_time) / math.log(size / last_size), 3),
+    }
+
+
+def _describe_growth(fit: Mapping[str, Any], variable: str) -> str:
+    return (
+        f"{variable}^{fit['exponent']:.2f} (R² {fit['r_squared']:.2f}), "
+        f"{variable}^{fit['final_exponent']:.2f} between the two largest sizes"
+    )
+
+
+def print_sweep_entry(entry: Mapping[str, Any]):
+    print(f"  {entry['feature']}: {STRESS_FEATURES[entry['feature']].description}")
+    print("         N    lines  CPU time  net time   memory  errors")
+    for size, lines, times, memory, errors in zip(
+        entry["sizes"],
+        entry["lines"],
+        entry["cpu_time"],
+        entry["peak_rss_mib"],
+        entry["errors"],
+    ):
+        cpu_time = statistics.median(times)
+        print(
+            f"  {size:8}  {lines:7}  {cpu_time:7.2f}s  "
+            f"{_net_time(cpu_time, entry['baseline_cpu_time']):7.2f}s  "
+            f"{statistics.median(memory):4.0f} MiB  {errors:6}"
+        )
+    if entry["exceeded"] is not None:
+        print(f"  exceeded the {entry['exceeded']}")
+    if entry["growth_in_n"] is None:
+        print(
+            f"  too few sizes took {_MIN_NET_TIME}s longer than an empty module "
+            "to fit the growth"
+        )
+        return
+    print(f"  time grows like {_describe_growth(entry['growth_in_n'], 'N')}")
+    print(f"  and like {_describe_growth(entry['growth_in_lines'], 'lines')}")
+
+
+def benchmark_sweep(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    options: _BenchmarkOptions,
+) -> bool:
+    """
+    Times each type checker on generated files that use one feature of the
+    type system at growing sizes, and fits how the time grows with the
+    size. The fixed cost of a run, measured on an empty module, is taken
+    off first. Since some generated files grow faster than the size of the
+    feature, the growth is also fitted against the number of lines. A
+    type checker is flagged if, between the two largest sizes, its time
+    grows faster than the `--max-exponent` power of the number of lines,
+    or if a run takes longer than `--timeout`, after which larger sizes
+    are skipped. Returns True if any type checker was flagged.
+    """
+    features = options.features or list(STRESS_FEATURES)
+    sizes = {
+        feature: sorted(set(options.sizes or STRESS_FEATURES[feature].sizes))
+        for feature in features
+    }
+    sources: dict[str, str] = {}
+    lines: dict[str, list[int]] = {}
+    for feature in features:
+        lines[feature] = []
+        for size in sizes[feature]:
+            source = STRESS_FEATURES[feature].generate(size)
+            sources[_get_stress_file(feature, size)] = source
+            lines[feature].append(source.count("\n"))
+
+    def check(run: StressRun) -> bool:
+        found_cliff = False
+        for feature in features:
+            measurements, exceeded = run.time_files(
+                [_get_stress_file(feature, size) for size in sizes[feature]]
+            )
+            measured_sizes = sizes[feature][: len(measurements)]
+            measured_lines = lines[feature][: len(measurements)]
+            net_times = [run.net_time(times) for times, _, _ in measurements]
+            entry = run.record(
+                print_sweep_entry,
+                feature=feature,
+                sizes=measured_sizes,
+                lines=measured_lines,
+                **_get_stress_series(measurements),
+                # Larger sizes would take even longer.
+                exceeded=(
+                    None
+                    if exceeded is None
+                    else f"{exceeded} at N={sizes[feature][len(measurements)]}"
+                ),
+                growth_in_n=fit_growth(measured_sizes, net_times),
+                growth_in_lines=fit_growth(measured_lines, net_times),
+            )
+
+            growth = entry["growth_in_lines"]
+            if entry["exceeded"] is not None:
+                print(
+                    f"  Cliff: {run.type_checker.name} exceeded its "
+                    f"{entry['exceeded']} on {feature}"
+                )
+                found_cliff = True
+            elif growth is not None and growth["final_exponent"] > options.max_exponent:
+                print(
+                    f"  Cliff: the time of {run.type_checker.name} grows faster than "
+                    f"lines^{options.max_exponent} on {feature}"
+                )
+                found_cliff = True
+        return found_cliff
+
+    return run_stress_benchmark(
+        root_dir,
+        type_checkers,
+        options,
+        "sweep",
+        sources,
+        f"Sweeping {', '.join(features)}",
+        check,
+    )
+
+
+def _time_empty_module(type_checker: TypeChecker, empty_file: str, trials: int) -> Summary:
+    # The CPU time of runs with a cold cache on an empty module.
+    times: list[float] = []
+    for _ in range(trials):
+        type_checker.clear_cache()
+        times.append(_time_run(type_checker, [empty_file]))
+    return summarize(times)
+
+
+def print_baseline(baseline: Summary):
+    print(
+        f"  empty module: median {baseline.median:.2f}s, IQR {baseline.iqr:.2f}s, "
+        "taken off the net times"
+    )
+
+
+def _net_time(cpu_time: float, baseline: float) -> float:
+    # The time of the empty module is as noisy as the times it is taken
+    # off, so a small file can seem to take less time than it.
+    return max(0.0, cpu_time - baseline)
+
+
+def time_stress_file(
+    type_checker: TypeChecker, stress_file: str, options: _BenchmarkOptions
+) -> tuple[list[float], list[float], list[Diagnostic]]:
+    """
+    Runs the type checker on a generated file `--trials` times with a cold
+    cache. Returns the CPU time and the peak memory in MiB of each run,
+    and the errors reported, of which there should be none.
+    """
+    times: list[float] = []
+    memory: list[float] = []
+    errors: list[Diagnostic] = []
+    for _ in range(options.trials):
+        type_checker.clear_cache()
+        with measure_usage() as usage:
+            output = type_checker.run_tests([stress_file])
+        if usage.processes:
+            times.append(usage.user_time + usage.system_time)
+        else:
+            # CPU times are not available on this platform.
+            times.append(usage.wall_time)
+        memory.append(usage.peak_rss / 2**20)
+        errors = [
+            diagnostic
+            for diagnostics in output.values()
+            for diagnostic in diagnostics
+            if type_checker.is_error(diagnostic)
+        ]
+    return times, memory, errors
+
+
+# The CPU time and the peak memory in MiB of each trial of a generated
+# file, and the errors reported on it.
+_StressTimes = tuple[list[float], list[float], list[Diagnostic]]
+
+
+@dataclass(frozen=True)
+class StressRun:
+    """
+    A type checker being timed on generated files, with the CPU time of an
+    empty module, which is taken off the times of the files.
+    """
+
+    mode: str
+    type_checker: TypeChecker
+    baseline: Summary
+    options: _BenchmarkOptions
+    history_file: Path
+
+    def time_files(self, stress_files: Sequence[str]) -> tuple[list[_StressTimes], str | None]:
+        """
+        Times the files in order until one of them exceeds a limit, as the
+        files that follow it are larger. Returns the times of the files
+        before it and the kind of limit exceeded, if any.
+        """
+        measurements: list[_StressTimes] = []
+        for stress_file in stress_files:
+            try:
+                measurements.append(time_stress_file(self.type_checker, stress_file, self.options))
+            except ResourceLimitError as error:
+                return measurements, error.kind
+        return measurements, None
+
+    def net_time(self, times: Sequence[float]) -> float:
+        return _net_time(statistics.median(times), self.baseline.median)
+
+    def record(
+        self, print_entry: Callable[[Mapping[str, Any]], None], **fields: Any
+    ) -> dict[str, Any]:
+        """
+        Prints a history entry with the given fields and appends it to the
+        benchmark history.
+        """
+        entry = {
+            **_describe_run(self.mode, self.type_checker, "cold", 1),
+            "baseline_cpu_time": round(self.baseline.median, 3),
+            "baseline_iqr": round(self.baseline.iqr, 3),
+            **fields,
+        }
+        print_entry(entry)
+        append_history(self.history_file, [entry])
+        return entry
+
+
+def run_stress_benchmark(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    options: _BenchmarkOptions,
+    mode: str,
+    sources: Mapping[str, str],
+    description: str,
+    check: Callable[[StressRun], bool],
+) -> bool:
+    """
+    Writes generated files to a corpus of their own, and for each type
+    checker times an empty module before calling `check`, which times the
+    files and returns whether the type checker should be flagged. Returns
+    True if any type checker was flagged.
+    """
+    history_file = _get_history_file(root_dir, options)
+    corpus_dir = _get_corpus_dir(root_dir, mode)
+    prepare_corpus_dir(root_dir / "tests", corpus_dir, with_test_cases=False)
+    for file_name, source in sources.items():
+        (corpus_dir / file_name).write_text(source, encoding="utf-8")
+
+    flagged = False
+    with empty_module(corpus_dir) as empty_file:
+        for type_checker in type_checkers:
+            if not type_checker.install():
+                print(f"Skipping benchmark for {type_checker.name}")
+                continue
+
+            type_checker = _in_corpus(root_dir, type_checker, corpus_dir)
+            print(f"{description} with {type_checker.name}")
+            type_checker.limits = ResourceLimits(timeout=options.timeout)
+            try:
+                baseline = _time_empty_module(type_checker, empty_file, options.trials)
+            except ResourceLimitError as error:
+                print(f"  {type_checker.name} exceeded its {error.kind} limit on an empty module")
+                flagged = True
+                continue
+            print_baseline(baseline)
+            run = StressRun(mode, type_checker, baseline, options, history_file)
+            flagged = check(run) or flagged
+    return flagged
+
+
+def _get_stress_series(measurements: Sequence[_StressTimes]) -> dict[str, Any]:
+    # The fields of a history entry for the files timed in order.
+    return {
+        "cpu_time": [[round(time, 3) for time in times] for times, _, _ in measurements],
+        "peak_rss_mib": [
+            [round(value, 1) for value in memory] for _, memory, _ in measurements
+        ],
+        "errors": [len(errors) for _, _, errors in measurements],
+    }
+
+
+def _get_stress_file(feature: str, size: int) -> str:
+    return f"stress_{feature.replace('-', '_')}_{size}.py"
+
+
+def print_expansion_entry(entry: Mapping[str, Any]):
+    print(f"  overloads with {entry['arms']} signatures")
+    print("  arguments  combinations  CPU time  net time   memory  errors")
+    for arguments, times, memory, errors in zip(
+        entry["arguments"], entry["cpu_time"], entry["peak_rss_mib"], entry["errors"]
+    ):
+        cpu_time = statistics.median(times)
+        print(
+            f"  {arguments:9}  {entry['arms'] ** arguments:12}  {cpu_time:7.2f}s  "
+            f"{_net_time(cpu_time, entry['baseline_cpu_time']):7.2f}s  "
+            f"{statistics.median(memory):4.0f} MiB  {errors:6}"
+        )
+    if entry["exceeded"] is not None:
+        print(f"  exceeded the {entry['exceeded']}")
+
+
+def benchmark_expansion(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    options: _BenchmarkOptions,
+) -> bool:
+    """
+    Times each type checker on calls to overloads that only type check
+    once union arguments are expanded, growing the number of union
+    arguments one step at a time for each number of overload signatures.
+    A type checker is flagged if its time grows by more than
+    `--max-growth` times from one step to the next, if a run takes longer
+    than `--timeout`, or if it reports an error, which means that it gave
+    up on the expansion. Returns True if any type checker was flagged.
+    """
+    steps = range(1, options.max_arguments + 1)
+    sources = {
+        _get_expansion_file(arguments, arms): generate_overload_expansion(arguments, arms)
+        for arms in options.arms
+        for arguments in steps
+    }
+
+    def check(run: StressRun) -> bool:
+        found_blowup = False
+        for arms in options.arms:
+            measurements, exceeded = run.time_files(
+                [_get_expansion_file(arguments, arms) for arguments in steps]
+            )
+            problems: list[str] = []
+            gave_up = False
+            previous_time: float | None = None
+            for arguments, (times, _, errors) in zip(steps, measurements):
+                step = f"{arguments} arguments of {arms} types"
+                if errors and not gave_up:
+                    problems.append(
+                        f"gave up at {step}: {run.type_checker.describe_error(errors[0])}"
+                    )
+                    gave_up = True
+                net_time = run.net_time(times)
+                if (
+                    previous_time is not None
+                    and net_time >= _MIN_NET_TIME
+                    and net_time > options.max_growth * max(previous_time, _MIN_NET_TIME)
+                ):
+                    problems.append(
+                        f"took {net_time / max(previous_time, _MIN_NET_TIME):.1f} "
+                        f"times longer at {step} than with one argument less"
+                    )
+                previous_time = net_time
+            if exceeded is not None:
+                # Larger steps would take even longer.
+                exceeded = f"{exceeded} at {steps[len(measurements)]} arguments of {arms} types"
+                problems.append(f"exceeded its {exceeded}")
+
+            run.record(
+                print_expansion_entry,
+                arms=arms,
+                arguments=list(steps[: len(measurements)]),
+                **_get_stress_series(measurements),
+                exceeded=exceeded,
+            )
+            for problem in problems:
+                print(f"  Blow-up: {run.type_checker.name} {problem}")
+            found_blowup = found_blowup or bool(problems)
+        return found_blowup
+
+    return run_stress_benchmark(
+        root_dir,
+        type_checkers,
+        options,
+        "expansion",
+        sources,
+        "Expanding union arguments of overloads",
+        check,
+    )
+
+
+def _get_expansion_file(arguments: int, arms: int) -> str:
+    return f"stress_overload_expansion_{arguments}x{arms}.py"
+
+
+def print_aliases_entry(entry: Mapping[str, Any]):
+    print(f"  {entry['form']} with {entry['width']} items at each level")
+    print("      depth    nodes  CPU time  net time   memory  errors")
+    for depth, times, memory, errors in zip(
+        entry["depths"], entry["cpu_time"], entry["peak_rss_mib"], entry["errors"]
+    ):
+        cpu_time = statistics.median(times)
+        print(
+            f"  {depth:9}  {depth * entry['width']:7}  {cpu_time:7.2f}s  "
+            f"{_net_time(cpu_time, entry['baseline_cpu_time']):7.2f}s  "
+            f"{statistics.median(memory):4.0f} MiB  {errors:6}"
+        )
+    if entry["exceeded"] is not None:
+        print(f"  exceeded the {entry['exceeded']}")
+    if entry["growth_in_depth"] is not None:
+        print(f"  time grows like {_describe_growth(entry['growth_in_depth'], 'depth')}")
+
+
+def print_aliases_grid(entries: Sequence[Mapping[str, Any]]):
+    """
+    Prints the net CPU time and peak memory of one type checker on one form
+    of recursive alias as a grid of depths by widths.
+    """
+    depths = sorted({depth for entry in entries for depth in entry["depths"]})
+    print(f"  {entries[0]['form']}: net time and memory by depth (rows) and width")
+    print("  " + " " * 7 + "".join(f"{entry['width']:>18}" for entry in entries))
+    for depth in depths:
+        cells: list[str] = []
+        for entry in entries:
+            if depth in entry["depths"]:
+                index = entry["depths"].index(depth)
+                net_time = _net_time(
+                    statistics.median(entry["cpu_time"][index]), entry["baseline_cpu_time"]
+                )
+                memory = statistics.median(entry["peak_rss_mib"][index])
+                cells.append(f"{net_time:7.2f}s {memory:5.0f} MiB")
+            elif entry["exceeded"] is not None:
+                cells.append(entry["exceeded"].split()[0])
+            else:
+                cells.append("-")
+        print(f"  {depth:7}" + "".join(f"{cell:>18}" for cell in cells))
+
+
+def benchmark_aliases(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    options: _BenchmarkOptions,
+) -> bool:
+    """
+    Times each type checker on JSON-like values nested to growing depths
+    and assigned to a recursive type alias, for each width of the values
+    and each way of spelling the alias. The values are a spine of nested
+    dicts and lists, so their number of nodes grows linearly with the
+    depth. A type checker that caches the subtype checks of a recursive
+    alias takes time linear in the depth, while one that expands the alias
+    again at every level slows down much faster. A type checker is flagged
+    if, between the two largest depths, its time grows faster than the
+    `--max-exponent` power of the depth, or if a run takes longer than
+    `--timeout`, after which larger depths are skipped. Returns True if
+    any type checker was flagged.
+    """
+    forms = options.forms or list(RECURSIVE_ALIAS_FORMS)
+    depths = sorted(set(options.depths))
+    widths = sorted(set(options.widths))
+    sources = {
+        _get_alias_file(form, depth, width): generate_recursive_alias(form, depth, width)
+        for form in forms
+        for depth in depths
+        for width in widths
+    }
+
+    def check(run: StressRun) -> bool:
+        found_expansion = False
+        for form in forms:
+            entries: list[dict[str, Any]] = []
+            for width in widths:
+                measurements, exceeded = run.time_files(
+                    [_get_alias_file(form, depth, width) for depth in depths]
+                )
+                measured_depths = depths[: len(measurements)]
+                entry = run.record(
+                    print_aliases_entry,
+                    form=form,
+                    width=width,
+                    depths=measured_depths,
+                    **_get_stress_series(measurements),
+                    # Deeper values would take even longer.
+                    exceeded=(
+                        None
+                        if exceeded is None
+                        else f"{exceeded} at depth {depths[len(measurements)]}"
+                    ),
+                    growth_in_depth=fit_growth(
+                        measured_depths,
+                        [run.net_time(times) for times, _, _ in measurements],
+                    ),
+                )
+                entries.append(entry)
+
+            print_aliases_grid(entries)
+            problems: list[str] = []
+            for entry in entries:
+                growth = entry["growth_in_depth"]
+                if entry["exceeded"] is not None:
+                    problems.append(
+                        f"exceeded its {entry['exceeded']} with width {entry['width']}"
+                    )
+                elif growth is not None and growth["final_exponent"] > options.max_exponent:
+                    problems.append(
+                        f"took time growing like depth^{growth['final_exponent']:.2f} "
+                        f"with width {entry['width']}"
+                    )
+            for problem in problems:
+                print(f"  Re-expansion: {run.type_checker.name} {problem} on {form}")
+            found_expansion = found_expansion or bool(problems)
+        return found_expansion
+
+    return run_stress_benchmark(
+        root_dir,
+        type_checkers,
+        options,
+        "aliases",
+        sources,
+        "Timing recursive type aliases",
+        check,
+    )
+
+
+def _get_alias_file(form: str, depth: int, width: int) -> str:
+    return f"stress_alias_{form.replace('-', '_')}_{depth}x{width}.py"
+
+
+def print_protocols_entry(entry: Mapping[str, Any]):
+    print(f"  {entry['kind']} protocols, passed at 1 and {entry['sites']} sites")
+    print("  protocols  members  classes  CPU time  net time   memory  sites time  errors")
+    for cell in entry["cells"]:
+        prefix = f"  {cell['protocols']:9}  {cell['members']:7}  {cell['classes']:7}"
+        if cell["exceeded"] is not None:
+            print(f"{prefix}  exceeded the {cell['exceeded']}")
+            continue
+        cpu_time = statistics.median(cell["cpu_time"])
+        print(
+            f"{prefix}  {cpu_time:7.2f}s  "
+            f"{_net_time(cpu_time, entry['baseline_cpu_time']):7.2f}s  "
+            f"{statistics.median(cell['peak_rss_mib']):4.0f} MiB  "
+            f"{statistics.median(cell['sites_cpu_time']):9.2f}s  {cell['errors']:6}"
+        )
+    if entry["growth"] is not None:
+        growth = entry["growth"]
+        print(
+            f"  time grows like matches^{growth['exponent']:.2f} "
+            f"(R² {growth['r_squared']:.2f}), counting each member of each protocol "
+            "matched by each class"
+        )
+    caching = entry["caching"]
+    if caching is not None:
+        extra_times = ", ".join(f"{time:.2f}s" for time in caching["extra_cpu_time"])
+        members = ", ".join(map(str, caching["members"]))
+        print(
+            f"  with {caching['protocols']} protocols and {caching['classes']} classes, "
+            f"{entry['sites'] - 1} more sites took {extra_times} with {members} members"
+        )
+        print(f"  {caching['verdict']}")
+
+
+def get_caching_verdict(
+    members: Sequence[int], extra_times: Sequence[float]
+) -> tuple[float | None, str]:
+    """
+    Tells whether a type checker caches protocol matches from the extra
+    time that the repeated call sites take, for growing numbers of protocol
+    members. If the matches are cached, repeating a site costs the same
+    whatever the number of members; otherwise it grows linearly with them.
+    Returns the exponent of the growth between the fewest and the most
+    members, if the extra time was long enough to measure, and a verdict.
+    """
+    if extra_times[-1] < _MIN_NET_TIME:
+        return None, f"caches matches (repeated sites took under {_MIN_NET_TIME}s)"
+    if len(members) < 2:
+        return None, "needs two numbers of members to tell whether matches are cached"
+    exponent = math.log(extra_times[-1] / max(extra_times[0], _MIN_NET_TIME)) / math.log(
+        members[-1] / members[0]
+    )
+    if _matches_at_every_site(exponent):
+        return exponent, (
+            f"matches again at every site (site time grows like members^{exponent:.2f})"
+        )
+    return exponent, f"caches matches (site time grows like members^{exponent:.2f})"
+
+
+def _matches_at_every_site(exponent: float | None) -> bool:
+    # The extra sites cost more with more members, so the matches are not
+    # cached.
+    return exponent is not None and exponent >= 0.5
+
+
+def benchmark_protocols(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    options: _BenchmarkOptions,
+) -> bool:
+    """
+    Times each type checker on matching classes against generic protocols,
+    for every combination of the numbers of protocols, members and classes,
+    and fits how the time grows with the number of members matched. Each
+    file is timed with every class passed as every protocol once, and again
+    at `--sites` call sites. How the time of the extra sites grows with the
+    number of members tells whether a type checker caches the result of
+    matching a class against a protocol. A type checker is flagged if it
+    matches again at every site, or if a run takes longer than `--timeout`.
+    Returns True if any type checker was flagged.
+    """
+    kinds = options.kinds or list(PROTOCOL_KINDS)
+    grid = list(
+        itertools.product(
+            sorted(set(options.protocols)),
+            sorted(set(options.members)),
+            sorted(set(options.classes)),
+        )
+    )
+    site_counts = (1, options.sites)
+    sources = {
+        _get_protocols_file(kind, protocols, members, classes, sites): (
+            generate_protocol_matching(kind, protocols, members, classes, sites)
+        )
+        for kind in kinds
+        for protocols, members, classes in grid
+        for sites in site_counts
+    }
+
+    def check(run: StressRun) -> bool:
+        found_slow = False
+        for kind in kinds:
+            cells: list[dict[str, Any]] = []
+            for protocols, members, classes in grid:
+                measurements, exceeded = run.time_files(
+                    [
+                        _get_protocols_file(kind, protocols, members, classes, sites)
+                        for sites in site_counts
+                    ]
+                )
+                cell: dict[str, Any] = {
+                    "protocols": protocols,
+                    "members": members,
+                    "classes": classes,
+                    "exceeded": None,
+                }
+                cells.append(cell)
+                if exceeded is not None:
+                    cell["exceeded"] = f"{exceeded} at {site_counts[len(measurements)]} sites"
+                    continue
+                (times, memory, errors), (sites_times, _, _) = measurements
+                cell["cpu_time"] = [round(time, 3) for time in times]
+                cell["peak_rss_mib"] = [round(value, 1) for value in memory]
+                cell["errors"] = len(errors)
+                cell["sites_cpu_time"] = [round(time, 3) for time in sites_times]
+
+            # Cells in which the type checker gave up, and reported errors,
+            # say nothing about how it scales.
+            checked = [
+                cell for cell in cells if cell["exceeded"] is None and not cell["errors"]
+            ]
+            measured = [
+                (
+                    cell["protocols"] * cell["members"] * cell["classes"],
+                    run.net_time(cell["cpu_time"]),
+                )
+                for cell in checked
+            ]
+            measured = [
+                (matches, time) for matches, time in measured if time >= _MIN_NET_TIME
+            ]
+            growth = None
+            if len({matches for matches, _ in measured}) >= 2:
+                fit = fit_power_law(
+                    [matches for matches, _ in measured], [time for _, time in measured]
+                )
+                growth = {
+                    "exponent": round(fit.slope, 3),
+                    "r_squared": round(fit.r_squared, 4),
+                }
+
+            # The repeated sites take longest, and so are measured most
+            # reliably, with the most protocols and classes.
+            largest = [
+                cell
+                for cell in checked
+                if cell["protocols"] == grid[-1][0] and cell["classes"] == grid[-1][2]
+            ]
+            extra_times = [
+                max(
+                    statistics.median(cell["sites_cpu_time"])
+                    - statistics.median(cell["cpu_time"]),
+                    0.0,
+                )
+                for cell in largest
+            ]
+            caching = None
+            if largest:
+                members = [cell["members"] for cell in largest]
+                exponent, verdict = get_caching_verdict(members, extra_times)
+                caching = {
+                    "protocols": grid[-1][0],
+                    "classes": grid[-1][2],
+                    "members": members,
+                    "extra_cpu_time": [round(time, 3) for time in extra_times],
+                    "exponent": None if exponent is None else round(exponent, 3),
+                    "verdict": verdict,
+                }
+
+            run.record(
+                print_protocols_entry,
+                kind=kind,
+                sites=options.sites,
+                cells=cells,
+                growth=growth,
+                caching=caching,
+            )
+            problems = [
+                f"exceeded its {cell['exceeded']} with {cell['protocols']} protocols, "
+                f"{cell['members']} members and {cell['classes']} classes"
+                for cell in cells
+                if cell["exceeded"] is not None
+            ]
+            if caching is not None and _matches_at_every_site(caching["exponent"]):
+                problems.append("matches again at every site")
+            for problem in problems:
+                print(f"  Slow matching: {run.type_checker.name} {problem} on {kind} protocols")
+            found_slow = found_slow or bool(problems)
+        return found_slow
+
+    return run_stress_benchmark(
+        root_dir,
+        type_checkers,
+        options,
+        "protocols",
+        sources,
+        "Matching classes against protocols",
+        check,
+    )
+
+
+def _get_protocols_file(
+    kind: str, protocols: int, members: int, classes: int, sites: int
+) -> str:
+    return f"stress_protocols_{kind}_{protocols}x{members}x{classes}_{sites}.py"
+
+
+def main():
+    # Some tests cover features that are available only in the
+    # latest version of Python (3.12), so we need this version.
+    assert sys.version_info >= (3, 12)
+
+    options = parse_benchmark_options(sys.argv[1:])
+
+    root_dir = Path(__file__).resolve().parent.parent
+    tests_dir = root_dir / "tests"
+    assert tests_dir.is_dir()
+
+    test_cases = get_test_cases(get_test_groups(root_dir), tests_dir)
+    if options.tests:
+        test_cases = [
+            test_case
+            for test_case in test_cases
+            if test_case.name in options.tests or test_case.stem in options.tests
+        ]
+        if not test_cases:
+            raise SystemExit(f"No test cases match {', '.join(options.tests)}")
+
+    type_checkers = [
+        type_checker
+        for type_checker in TYPE_CHECKERS
+        if not options.only_run or options.only_run == type_checker.name
+    ]
+
+    if options.mode == "sweep":
+        if benchmark_sweep(root_dir, type_checkers, options):
+            # A type checker's time grows too quickly with a feature.
+            sys.exit(1)
+        return
+    if options.mode == "expansion":
+        if benchmark_expansion(root_dir, type_checkers, options):
+            # A type checker blew up or gave up on union expansion.
+            sys.exit(1)
+        return
+    if options.mode == "aliases":
+        if benchmark_aliases(root_dir, type_checkers, options):
+            # A type checker expands recursive aliases again at every level.
+            sys.exit(1)
+        return
+    if options.mode == "protocols":
+        if benchmark_protocols(root_dir, type_checkers, options):
+            # A type checker matches protocols again at every call site.
+            sys.exit(1)
+        return
+
+    # Run in snapshots of the tests directory of their own, so that the
+    # caches that the benchmarks clear are not those of the harness.
+    type_checkers = [
+        stage_type_checker(root_dir, type_checker, f"{type_checker.name}-benchmark")
+        for type_checker in type_checkers
+    ]
+    if options.mode == "files":
+        benchmark_files(root_dir, type_checkers, test_cases, options)
+    elif options.mode == "startup":
+        benchmark_startup(root_dir, type_checkers, test_cases, options)
+    elif options.mode == "threads":
+        benchmark_threads(root_dir, type_checkers, test_cases, options)
+    elif options.mode == "edits":
+        benchmark_edits(root_dir, type_checkers, test_cases, options)
+    elif options.mode == "lsp":
+        benchmark_lsp(root_dir, type_checkers, test_cases, options)
+    elif options.mode == "scale":
+        benchmark_scale(root_dir, type_checkers, test_cases, options)
+    elif benchmark_suite(root_dir, type_checkers, test_cases, options):
+        # A regression was found.
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Builds larger corpora of test files for benchmarking the type checkers.
+"""
+
+import ast
+import io
+import keyword
+import re
+import shutil
+import tokenize
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Sequence
+
+from test_groups import get_test_dependencies
+from type_checker import TYPE_CHECKERS
+
+
+def replicate_tests(
+    tests_dir: Path,
+    test_cases: Sequence[Path],
+    corpus_dir: Path,
+    copies: int,
+) -> list[str]:
+    """
+    Fills `corpus_dir` with the modules, stubs and type checker
+    configuration files of the tests directory, and with `copies` copies
+    of each test case. The copies are named "<test>_copy<N>.py" and import
+    the same supporting modules as the original. Returns the names of the
+    test files in the corpus.
+    """
+    prepare_corpus_dir(tests_dir, corpus_dir, with_test_cases=True)
+
+    test_files: list[str] = []
+    for test_case in test_cases:
+        test_files.append(test_case.name)
+        for copy in range(1, copies):
+            copy_name = f"{test_case.stem}_copy{copy}{test_case.suffix}"
+            shutil.copyfile(test_case, corpus_dir / copy_name)
+            test_files.append(copy_name)
+    return test_files
+
+
+def prepare_corpus_dir(tests_dir: Path, corpus_dir: Path, *, with_test_cases: bool):
+    """
+    Empties `corpus_dir` and copies the type checker configuration files
+    and the supporting modules and stubs of the tests directory into it,
+    along with the test cases if `with_test_cases` is True.
+    """
+    if corpus_dir.exists():
+        shutil.rmtree(corpus_dir)
+    corpus_dir.mkdir(parents=True)
+
+    config_files = {
+        config_file
+        for type_checker in TYPE_CHECKERS
+        for config_file in type_checker.get_config_files()
+    }
+    for path in tests_dir.iterdir():
+        if path.name in config_files or (
+            path.suffix in (".py", ".pyi")
+            and (with_test_cases or path.name.startswith("_"))
+        ):
+            shutil.copyfile(path, corpus_dir / path.name)
+
+
+# The ways in which the packages of a generated corpus import each other.
+# In a "chain", each copy of a module imports the same module in the
+# previous package. A "cycle" also makes the first package import the
+# last. In a "fan-out", each module in the first package imports its
+# copies in all the other packages.
+IMPORT_SHAPES = ("chain", "cycle", "fan-out")
+
+
+@dataclass(frozen=True)
+class GeneratedCorpus:
+    """
+    A corpus made from the test cases. `packages` are the directories to
+    pass to a type checker, and `templates` maps the path of each generated
+    test file, relative to the corpus, to the test case it was made from.
+    """
+
+    packages: list[str]
+    templates: dict[str, Path]
+
+
+def generate_corpus(
+    tests_dir: Path,
+    test_cases: Sequence[Path],
+    corpus_dir: Path,
+    scale: int,
+    *,
+    shape: str = "chain",
+) -> GeneratedCorpus:
+    """
+    Fills `corpus_dir` with `scale` packages, each holding a copy of every
+    test case. The copies of a test case are named "<test>_c<N>.py", and
+    the symbols defined at the top level of each copy are renamed so that
+    the packages do not all define the same names. The copies import each
+    other in the given shape. Their line numbers are unchanged, so the
+    "# E" comments still describe the errors expected in them, and they
+    import the same supporting modules as the original, which are shared
+    at the top of the corpus.
+    """
+    if shape not in IMPORT_SHAPES:
+        raise ValueError(f"Unknown import shape {shape!r}")
+    prepare_corpus_dir(tests_dir, corpus_dir, with_test_cases=False)
+
+    packages = [f"pkg{copy:04d}" for copy in range(scale)]
+    templates: dict[str, Path] = {}
+    for copy, package in enumerate(packages):
+        package_dir = corpus_dir / package
+        package_dir.mkdir()
+        (package_dir / "__init__.py").write_text("", encoding="utf-8")
+
+        for test_case in test_cases:
+            module = _get_copy_name(test_case.stem, copy)
+            source = test_case.read_text(encoding="utf-8")
+            renamed = rename_symbols(source, f"c{copy}")
+            if renamed is not None:
+                # Test cases that cannot be parsed are copied unchanged, as
+                # adding anything to them could move their syntax errors.
+                links = _get_linked_copies(copy, scale, shape)
+                source = renamed
+                if links:
+                    source = source.rstrip("\n")
+                    source += "\n\n# Imports added by the corpus generator.\n"
+                    for linked_copy in links:
+                        linked_module = _get_copy_name(test_case.stem, linked_copy)
+                        source += (
+                            f"from {packages[linked_copy]} import "
+                            f"{linked_module} as {linked_module}\n"
+                        )
+            file_name = f"{module}{test_case.suffix}"
+            (package_dir / file_name).write_text(source, encoding="utf-8")
+            templates[f"{package}/{file_name}"] = test_case
+
+    return GeneratedCorpus(packages, templates)
+
+
+def _get_copy_name(stem: str, copy: int) -> str:
+    return f"{stem}_c{copy:04d}"
+
+
+def _get_linked_copies(copy: int, scale: int, shape: str) -> list[int]:
+    if shape == "fan-out":
+        return list(range(1, scale)) if copy == 0 else []
+    if copy > 0:
+        return [copy - 1]
+    if shape == "cycle" and scale > 1:
+        return [scale - 1]
+    return []
+
+
+def rename_symbols(source: str, tag: str) -> str | None:
+    """
+    Renames the symbols defined at the top level of a module by adding
+    `tag` to them, both where they are used as names and within string
+    literals, such as forward references. Names that are also used as
+    attributes, keyword arguments or parameters are left alone, because
+    those uses cannot be told apart from uses of other symbols with the
+    same name. Returns None if the module cannot be parsed.
+    """
+    try:
+        tree = ast.parse(source)
+        tokens = list(tokenize.generate_tokens(io.StringIO(source).readline))
+    except (SyntaxError, tokenize.TokenError):
+        return None
+
+    renames = {name: _add_tag(name, tag) for name in _get_renamable_names(tree)}
+    if not renames:
+        return source
+    pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, renames)) + r")\b")
+
+    line_starts = [0]
+    for line in io.StringIO(source):
+        line_starts.append(line_starts[-1] + len(line))
+
+    replacements: list[tuple[int, int, str]] = []
+    for token in tokens:
+        if token.type == tokenize.NAME and token.string in renames:
+            replacement = renames[token.string]
+        elif token.type == tokenize.STRING:
+            # Leave the prefix of the literal, such as "b" or "r", alone.
+            prefix = re.match(r"[A-Za-z]*", token.string).group()
+            body = pattern.sub(
+                lambda match: renames[match.group()], token.string[len(prefix) :]
+            )
+            replacement = prefix + body
+            if replacement == token.string:
+                continue
+        else:
+            continue
+        start = line_starts[token.start[0] - 1] + token.start[1]
+        end = line_starts[token.end[0] - 1] + token.end[1]
+        replacements.append((start, end, replacement))
+
+    for start, end, replacement in reversed(replacements):
+        source = source[:start] + replacement + source[end:]
+    return source
+
+
+def _get_renamable_names(tree: ast.Module) -> set[str]:
+    defined: set[str] = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            defined.add(node.name)
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                defined.update(_get_assigned_names(target))
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+            defined.add(node.target.id)
+        elif isinstance(node, ast.TypeAlias) and isinstance(node.name, ast.Name):
+            defined.add(node.name.id)
+
+    excluded = set(keyword.softkwlist)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and any(
+            alias.name == "*" for alias in node.names
+        ):
+            # Any symbol may come from the other module, which is not renamed.
+            return set()
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            excluded.update(
+                (alias.asname or alias.name).partition(".")[0] for alias in node.names
+            )
+        elif isinstance(node, ast.Attribute):
+            excluded.add(node.attr)
+        elif isinstance(node, ast.keyword) and node.arg is not None:
+            excluded.add(node.arg)
+        elif isinstance(node, ast.arg):
+            excluded.add(node.arg)
+        elif isinstance(node, ast.MatchClass):
+            excluded.update(node.kwd_attrs)
+
+    return {
+        name
+        for name in defined - excluded
+        if not (name.startswith("__") and name.endswith("__"))
+    }
+
+
+def _get_assigned_names(target: ast.expr) -> list[str]:
+    # Assignments to attributes and subscripts do not define names.
+    if isinstance(target, ast.Name):
+        return [target.id]
+    if isinstance(target, (ast.Tuple, ast.List)):
+        return [name for element in target.elts for name in _get_assigned_names(element)]
+    if isinstance(target, ast.Starred):
+        return _get_assigned_names(target.value)
+    return []
+
+
+def _add_tag(name: str, tag: str) -> str:
+    # Keep leading underscores, which make a name private, and the case of
+    # the name, which some type checkers use to recognize constants.
+    stripped = name.lstrip("_")
+    underscores = name[: len(name) - len(stripped)]
+    if stripped.isupper():
+        tag = tag.upper()
+    return f"{underscores}{tag}_{stripped}"
+
+
+@dataclass(frozen=True)
+class ScriptedEdit:
+    """
+    An edit that can be applied to a file over and over, making a real
+    change each time. The template is appended to the original contents
+    of the file, with "{value}" replaced by alternating values.
+    `affected` are the test files whose diagnostics the edit may change.
+    """
+
+    kind: str
+    path: Path
+    original: str
+    template: str
+    values: tuple[str, ...]
+    affected: tuple[str, ...]
+
+    def apply(self, iteration: int):
+        value = self.values[iteration % len(self.values)]
+        self.path.write_text(
+            self.original + self.template.format(value=value), encoding="utf-8"
+        )
+
+    def revert(self):
+        self.path.write_text(self.original, encoding="utf-8")
+
+
+def make_edits(corpus_dir: Path, test_file: str) -> list[ScriptedEdit]:
+    """
+    Returns the edits made by the edit latency benchmark in a corpus: a
+    change to a function body in a test file, a change to a function
+    signature in the helper module imported by the most test files, and a
+    change to the stub imported by the most test files.
+    """
+    test_cases = [
+        path for path in sorted(corpus_dir.glob("*.py")) if not path.name.startswith("_")
+    ]
+    dependents: dict[str, list[str]] = {}
+    for test_case in test_cases:
+        for dependency in get_test_dependencies(test_case):
+            dependents.setdefault(dependency.name, []).append(test_case.name)
+
+    edits = [
+        _make_edit(
+            "body",
+            corpus_dir / test_file,
+            "\n\ndef _edited_body() -> int:\n    return {value}\n",
+            ("1", "2"),
+            (test_file,),
+        )
+    ]
+    for kind, suffix, template in (
+        (
+            "signature",
+            ".py",
+            "\n\ndef _edited_signature(x: {value}) -> {value}:\n    return x\n",
+        ),
+        ("stub", ".pyi", "\n_edited_stub: {value}\n"),
+    ):
+        candidates = [name for name in dependents if name.endswith(suffix)]
+        if not candidates:
+            continue
+        helper = max(candidates, key=lambda name: (len(dependents[name]), name))
+        edits.append(
+            _make_edit(
+                kind,
+                corpus_dir / helper,
+                template,
+                ("int", "str"),
+                (helper, *dependents[helper]),
+            )
+        )
+    return edits
+
+
+def _make_edit(
+    kind: str,
+    path: Path,
+    template: str,
+    values: tuple[str, ...],
+    affected: tuple[str, ...],
+) -> ScriptedEdit:
+    return ScriptedEdit(
+        kind, path, path.read_text(encoding="utf-8"), template, values, affected
+    )
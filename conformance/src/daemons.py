@@ -0,0 +1,413 @@
+"""
+Long-running type checker processes that stay warm between runs.
+"""
+
+import sys
+from abc import ABC, abstractmethod
+from pathlib import Path
+from subprocess import PIPE, run
+from typing import Any, Mapping, Sequence
+
+from lsp import (
+    SEVERITY_ERROR,
+    SEVERITY_INFORMATION,
+    SEVERITY_WARNING,
+    LanguageServerClient,
+    LanguageServerError,
+)
+from type_checker import Diagnostic, MypyTypeChecker, TypeChecker, group_by_file
+
+
+class CheckerDaemon(ABC):
+    """
+    A warm type checker process that re-checks test files on request.
+    It returns diagnostics in the same form as `TypeChecker.run_tests`.
+    """
+
+    def __init__(self, type_checker: TypeChecker):
+        self.type_checker = type_checker
+
+    @abstractmethod
+    def start(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def run_tests(self, test_files: Sequence[str]) -> dict[str, list[Diagnostic]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def stop(self):
+        raise NotImplementedError
+
+
+class DmypyDaemon(CheckerDaemon):
+    """
+    Uses the mypy daemon. The daemon is not stopped by the harness, so it
+    stays warm across invocations until `dmypy stop` is run in the type
+    checker's working directory.
+    """
+
+    type_checker: MypyTypeChecker
+
+    def __init__(self, type_checker: TypeChecker):
+        super().__init__(type_checker)
+        self._test_files: set[str] = set()
+
+    def _dmypy(self, *args: str) -> str:
+        proc = run(
+            [sys.executable, "-m", "mypy.dmypy", *args],
+            stdout=PIPE,
+            text=True,
+            encoding="utf-8",
+            cwd=self.type_checker.working_dir,
+        )
+        return proc.stdout
+
+    def start(self):
+        # "dmypy run" starts the daemon on first use, or restarts it if
+        # the mypy flags have changed.
+        pass
+
+    def run_tests(self, test_files: Sequence[str]) -> dict[str, list[Diagnostic]]:
+        # Changing the set of files makes the daemon rebuild its state, so
+        # keep checking every file it has seen and filter the output.
+        self._test_files.update(test_files)
+        stdout = self._dmypy(
+            "run", "--", *self.type_checker.get_flags(), *sorted(self._test_files)
+        )
+        results_dict = group_by_file(self.type_checker.parse_output(stdout))
+        return {
+            file_name: diagnostics
+            for file_name, diagnostics in results_dict.items()
+            if file_name in test_files
+        }
+
+    def stop(self):
+        pass
+
+    def stop_server(self):
+        """
+        Stops the mypy daemon, which `stop` leaves running.
+        """
+        self._dmypy("stop")
+
+
+class LanguageServerDaemon(CheckerDaemon):
+    """
+    Keeps a language server running and asks it for the diagnostics of each
+    test file. The server is stopped when the harness exits, so it only
+    stays warm across the repeated checks of watch mode; a single run with
+    a server starts it cold. If the server cannot be started, does not
+    report the diagnostics of a file in time, or exits, it is stopped and
+    the batch command of the type checker is used instead.
+    """
+
+    # Maximum time to wait for a server to publish diagnostics for a file.
+    timeout = 120.0
+    # Time without new diagnostics after which the server is considered done,
+    # for servers that publish partial results first.
+    quiet_period = 0.2
+
+    def __init__(self, type_checker: TypeChecker):
+        super().__init__(type_checker)
+        self._client: LanguageServerClient | None = None
+        self._mtimes: dict[Path, int] = {}
+        self._failed = False
+
+    @abstractmethod
+    def get_server_command(self) -> list[str]:
+        raise NotImplementedError
+
+    def get_settings(self) -> Mapping[str, Any] | None:
+        """
+        Returns the settings that the server is given, which should make it
+        report what the batch command reports, or None for its defaults.
+        """
+        return None
+
+    @abstractmethod
+    def convert_diagnostic(
+        self, file_name: str, diagnostic: Mapping[str, Any]
+    ) -> list[Diagnostic]:
+        """
+        Converts an LSP diagnostic into the diagnostics that a batch run of
+        the type checker would report for it.
+        """
+        raise NotImplementedError
+
+    @property
+    def root_dir(self) -> Path:
+        """
+        The directory that the server treats as its workspace, which holds
+        the test files.
+        """
+        return self.type_checker.working_dir or Path.cwd()
+
+    def start(self):
+        self._client = LanguageServerClient(
+            self.get_server_command(), self.root_dir, settings=self.get_settings()
+        )
+        try:
+            self._client.start(timeout=self.timeout)
+        except (TimeoutError, LanguageServerError) as error:
+            self._fall_back(error)
+            return
+        self._mtimes = self._get_mtimes()
+
+    def stop(self):
+        if self._client is not None:
+            self._client.stop()
+            self._client = None
+
+    @property
+    def failed(self) -> bool:
+        """
+        Whether the server failed and the batch command is used instead.
+        """
+        return self._failed
+
+    @property
+    def client(self) -> LanguageServerClient:
+        assert self._client is not None, "Daemon has not been started"
+        return self._client
+
+    @property
+    def last_publish_time(self) -> float | None:
+        """
+        The `time.perf_counter` value when the server last published
+        diagnostics. This is earlier than the time `run_tests` returns,
+        which also waits for the server to stop publishing updates.
+        """
+        return self._client.last_publish_time if self._client is not None else None
+
+    def run_tests(self, test_files: Sequence[str]) -> dict[str, list[Diagnostic]]:
+        if self._failed:
+            return self.type_checker.run_tests(test_files)
+        try:
+            return self._check_files(self.client, test_files)
+        except (TimeoutError, LanguageServerError) as error:
+            self._fall_back(error)
+            return self.type_checker.run_tests(test_files)
+
+    def _fall_back(self, error: Exception):
+        print(
+            f"{self.type_checker.name} language server failed ({error}), "
+            "stopping it and using the batch command instead"
+        )
+        self.stop()
+        self._failed = True
+
+    def _check_files(
+        self, client: LanguageServerClient, test_files: Sequence[str]
+    ) -> dict[str, list[Diagnostic]]:
+        # Tell the server about files that changed on disk since the last run.
+        mtimes = self._get_mtimes()
+        changed = {path for path, mtime in mtimes.items() if self._mtimes.get(path) != mtime}
+        self._mtimes = mtimes
+        if changed:
+            client.notify_files_changed(sorted(changed))
+
+        publish_counts: dict[Path, int | None] = {}
+        for test_file in test_files:
+            path = (self.root_dir / test_file).resolve()
+            count = client.get_publish_count(path)
+            if not client.is_open(path):
+                client.open_document(path)
+                publish_counts[path] = count
+            elif path in changed:
+                client.change_document(path)
+                publish_counts[path] = count
+            else:
+                publish_counts[path] = None
+
+        # Wait until the server has published diagnostics for every file that
+        # was opened or changed, and then until it stops publishing updates.
+        if not client.supports_pull_diagnostics:
+            for path, published_after in publish_counts.items():
+                if published_after is not None:
+                    client.get_diagnostics(
+                        path, published_after=published_after, timeout=self.timeout
+                    )
+            if changed or any(count is not None for count in publish_counts.values()):
+                client.wait_until_quiet(self.quiet_period)
+
+        results_dict: dict[str, list[Diagnostic]] = {}
+        for test_file in test_files:
+            path = (self.root_dir / test_file).resolve()
+            diagnostics = [
+                converted
+                for diagnostic in sorted(
+                    client.get_diagnostics(path, timeout=self.timeout), key=_position
+                )
+                for converted in self.convert_diagnostic(path.name, diagnostic)
+            ]
+            if diagnostics:
+                results_dict[path.name] = diagnostics
+
+        return results_dict
+
+    def _get_mtimes(self) -> dict[Path, int]:
+        return {
+            path.resolve(): path.stat().st_mtime_ns
+            for pattern in ("*.py", "*.pyi")
+            for path in self.root_dir.glob(pattern)
+        }
+
+
+def _position(diagnostic: Mapping[str, Any]) -> tuple[int, int]:
+    start = diagnostic["range"]["start"]
+    return start["line"], start["character"]
+
+
+def _to_diagnostic(
+    file_name: str, diagnostic: Mapping[str, Any], severity: str, message: str
+) -> Diagnostic:
+    start = diagnostic["range"]["start"]
+    end = diagnostic["range"]["end"]
+    code = diagnostic.get("code")
+    return Diagnostic(
+        file_name,
+        start["line"] + 1,
+        start["character"] + 1,
+        severity,
+        str(code) if code is not None else None,
+        message,
+        end_line=end["line"] + 1,
+        end_column=end["character"] + 1,
+    )
+
+
+class PyrightDaemon(LanguageServerDaemon):
+    def get_server_command(self) -> list[str]:
+        return [sys.executable, "-m", "pyright.langserver", "--stdio"]
+
+    def get_settings(self) -> Mapping[str, Any] | None:
+        # The defaults of the command line, which resolves imports with the
+        # interpreter that runs it.
+        return {
+            "python": {
+                "pythonPath": sys.executable,
+                "analysis": {
+                    "typeCheckingMode": "standard",
+                    "diagnosticMode": "openFilesOnly",
+                },
+            }
+        }
+
+    def convert_diagnostic(
+        self, file_name: str, diagnostic: Mapping[str, Any]
+    ) -> list[Diagnostic]:
+        severity = {
+            SEVERITY_ERROR: "error",
+            SEVERITY_WARNING: "warning",
+            SEVERITY_INFORMATION: "information",
+        }.get(diagnostic.get("severity", SEVERITY_ERROR))
+        if severity is None:
+            return []
+        return [
+            _to_diagnostic(file_name, diagnostic, severity, diagnostic["message"])
+        ]
+
+
+class TyDaemon(LanguageServerDaemon):
+    def get_server_command(self) -> list[str]:
+        return [sys.executable, "-m", "ty", "server"]
+
+    def get_settings(self) -> Mapping[str, Any] | None:
+        # The batch command is given the configuration file explicitly.
+        return {"ty": {"configurationFile": str(self.root_dir / "ty.toml")}}
+
+    def convert_diagnostic(
+        self, file_name: str, diagnostic: Mapping[str, Any]
+    ) -> list[Diagnostic]:
+        severity = {
+            SEVERITY_ERROR: "error",
+            SEVERITY_WARNING: "warning",
+            SEVERITY_INFORMATION: "info",
+        }.get(diagnostic.get("severity", SEVERITY_ERROR))
+        if severity is None:
+            return []
+        # The concise format omits sub-diagnostics on the following lines.
+        message = diagnostic["message"].split("\n")[0]
+        return [_to_diagnostic(file_name, diagnostic, severity, message)]
+
+
+class PyreflyDaemon(LanguageServerDaemon):
+    def get_server_command(self) -> list[str]:
+        return ["pyrefly", "lsp"]
+
+    def get_settings(self) -> Mapping[str, Any] | None:
+        # pyrefly.toml in the workspace is picked up as for the batch
+        # command, which finds the interpreter that runs the harness.
+        return {"python": {"pythonPath": sys.executable}}
+
+    def convert_diagnostic(
+        self, file_name: str, diagnostic: Mapping[str, Any]
+    ) -> list[Diagnostic]:
+        severity = {SEVERITY_ERROR: "error", SEVERITY_WARNING: "warning"}.get(
+            diagnostic.get("severity", SEVERITY_ERROR)
+        )
+        if severity is None:
+            return []
+        # The min-text format omits hints on the following lines.
+        message = diagnostic["message"].split("\n")[0]
+        return [_to_diagnostic(file_name, diagnostic, severity, message)]
+
+
+class ZubanDaemon(LanguageServerDaemon):
+    # The server takes its settings from the project file of the snapshot,
+    # like the batch command.
+
+    def get_server_command(self) -> list[str]:
+        return ["zuban", "server"]
+
+    def convert_diagnostic(
+        self, file_name: str, diagnostic: Mapping[str, Any]
+    ) -> list[Diagnostic]:
+        lineno = diagnostic["range"]["start"]["line"] + 1
+        # Notes attached to an error are sent as additional message lines.
+        message, *notes = diagnostic["message"].split("\n")
+        if diagnostic.get("severity", SEVERITY_ERROR) == SEVERITY_ERROR:
+            diagnostics = [
+                Diagnostic(file_name, lineno, None, "error", diagnostic.get("code"), message)
+            ]
+        else:
+            diagnostics = [Diagnostic(file_name, lineno, None, "note", None, message)]
+        diagnostics.extend(
+            Diagnostic(file_name, lineno, None, "note", None, note) for note in notes
+        )
+        return diagnostics
+
+
+DAEMONS: Mapping[str, type[CheckerDaemon]] = {
+    "mypy": DmypyDaemon,
+    "pyright": PyrightDaemon,
+    "zuban": ZubanDaemon,
+    "pyrefly": PyreflyDaemon,
+    "ty": TyDaemon,
+}
+
+_running_daemons: dict[str, CheckerDaemon] = {}
+
+
+def get_daemon(type_checker: TypeChecker) -> CheckerDaemon | None:
+    """
+    Returns a started daemon for the type checker, reusing one that is
+    already running in this process. Returns None if the type checker has
+    no daemon backend.
+    """
+    daemon = _running_daemons.get(type_checker.name)
+    if daemon is None:
+        daemon_class = DAEMONS.get(type_checker.name)
+        if daemon_class is None:
+            return None
+        daemon = daemon_class(type_checker)
+        daemon.start()
+        _running_daemons[type_checker.name] = daemon
+    return daemon
+
+
+def stop_daemons():
+    for daemon in _running_daemons.values():
+        daemon.stop()
+    _running_daemons.clear()
@@ -0,0 +1,236 @@
+"""
+Finds the errors that each test case expects type checkers to report,
+as marked by "# E" comments.
+"""
+
+import hashlib
+import io
+import json
+import re
+import tokenize
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Mapping, Sequence
+
+# Increment when the parsing rules change, to invalidate cached indexes.
+_INDEX_VERSION = 2
+
+
+@dataclass(frozen=True)
+class ExpectedErrors:
+    """
+    The errors expected for a test case.
+
+    `lines` maps a line number to (number of required errors, number of
+    optional errors). `groups` maps an error tag to ([lines where the error
+    may appear], allow multiple). If allow multiple is True, the error may
+    appear on multiple lines; otherwise, it must appear exactly once.
+
+    For example, the following test case:
+
+        x: int = "x"  # E
+        y: int = "y"  # E?
+        @final  # E[final]
+        def f(): pass  # E[final]
+
+    has the expected errors:
+
+        ExpectedErrors(
+            lines={1: (1, 0), 2: (0, 1)},
+            groups={"final": ([3, 4], False)},
+        )
+    """
+
+    lines: Mapping[int, tuple[int, int]]
+    groups: Mapping[str, tuple[Sequence[int], bool]]
+
+
+# Expected errors that have been parsed in this process, keyed by path and
+# checked against the file's modification time.
+_expected_errors: dict[Path, tuple[int, ExpectedErrors]] = {}
+
+
+def get_expected_errors(test_case: Path) -> ExpectedErrors:
+    """
+    Returns the errors expected for a test case. Raises a ValueError if
+    the test case has malformed error tags.
+    """
+    mtime = test_case.stat().st_mtime_ns
+    cached = _expected_errors.get(test_case)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    expected_errors, problems = parse_expected_errors(test_case.read_bytes())
+    if problems:
+        raise ValueError("\n".join(f"{problem} in {test_case}" for problem in problems))
+    _expected_errors[test_case] = (mtime, expected_errors)
+    return expected_errors
+
+
+def index_expected_errors(root_dir: Path, test_cases: Sequence[Path]):
+    """
+    Finds the expected errors for all test cases up front, so that every
+    type checker shares them. Test cases that have not changed since the
+    last run are read from an on-disk index keyed by file content. Raises
+    a ValueError that lists the malformed error tags in all test cases.
+    """
+    index_file = root_dir / ".cache" / "expected_errors.json"
+    try:
+        with open(index_file, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") != _INDEX_VERSION:
+            index = {}
+    except (FileNotFoundError, json.JSONDecodeError):
+        index = {}
+    entries: dict[str, Any] = index.get("entries", {})
+
+    sources = {test_case: test_case.read_bytes() for test_case in test_cases}
+    mtimes = {test_case: test_case.stat().st_mtime_ns for test_case in test_cases}
+    keys = {
+        test_case: hashlib.sha256(source).hexdigest()
+        for test_case, source in sources.items()
+    }
+
+    missing = [test_case for test_case in test_cases if keys[test_case] not in entries]
+    if missing:
+        with ProcessPoolExecutor() as executor:
+            results = executor.map(
+                parse_expected_errors,
+                [sources[test_case] for test_case in missing],
+                chunksize=8,
+            )
+            for test_case, (expected_errors, problems) in zip(missing, results):
+                entries[keys[test_case]] = _to_json(expected_errors, problems)
+
+    problems: list[str] = []
+    for test_case in test_cases:
+        entry = entries[keys[test_case]]
+        if entry["problems"]:
+            problems.extend(f"{problem} in {test_case}" for problem in entry["problems"])
+        else:
+            _expected_errors[test_case] = (mtimes[test_case], _from_json(entry))
+
+    if missing:
+        # Only keep entries for the current contents of the test cases.
+        used_keys = set(keys.values())
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(index_file, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": _INDEX_VERSION,
+                    "entries": {
+                        key: entry for key, entry in entries.items() if key in used_keys
+                    },
+                },
+                f,
+            )
+
+    if problems:
+        raise ValueError(
+            f"Found {len(problems)} malformed error tags:\n"
+            + "\n".join(problems)
+        )
+
+
+def parse_expected_errors(source: bytes) -> tuple[ExpectedErrors, list[str]]:
+    """
+    Parses the "# E" comments in the source of a test case. Returns the
+    expected errors and a list of problems with malformed error tags.
+    """
+    lines: dict[int, tuple[int, int]] = {}
+    groups: dict[str, tuple[list[int], bool]] = {}
+    problems: list[str] = []
+
+    for lineno, comment in _get_comments(source):
+        required = 0
+        optional = 0
+        for match in re.finditer(r"# E\??(?=:|$| )", comment):
+            if match.group() == "# E":
+                required += 1
+            else:
+                optional += 1
+        if required or optional:
+            lines[lineno] = (required, optional)
+        for match in re.finditer(r"# E\[([^\]]+)\]", comment):
+            tag = match.group(1)
+            if tag.endswith("+"):
+                allow_multiple = True
+                tag = tag[:-1]
+            else:
+                allow_multiple = False
+            if tag not in groups:
+                groups[tag] = ([lineno], allow_multiple)
+            else:
+                if groups[tag][1] != allow_multiple:
+                    problems.append(f"Error group {tag} has inconsistent allow_multiple value")
+                groups[tag][0].append(lineno)
+    for group, (linenos, _) in groups.items():
+        # A tag repeated in one comment still only covers a single line.
+        if len(set(linenos)) == 1:
+            problems.append(f"Error group {group} only appears on a single line")
+
+    return ExpectedErrors(lines, groups), problems
+
+
+_NON_CODE_TOKENS = frozenset(
+    {
+        tokenize.ENCODING,
+        tokenize.NL,
+        tokenize.NEWLINE,
+        tokenize.INDENT,
+        tokenize.DEDENT,
+        tokenize.ENDMARKER,
+    }
+)
+
+
+def _get_comments(source: bytes) -> list[tuple[int, str]]:
+    """
+    Returns the line number and text of each comment that follows code
+    on the same line. Comments on lines without code are ignored, which
+    allows test cases to be commented out.
+    """
+    code_lines: set[int] = set()
+    comments: list[tuple[int, str]] = []
+    try:
+        for token in tokenize.tokenize(io.BytesIO(source).readline):
+            if token.type == tokenize.COMMENT:
+                comments.append((token.start[0], token.string))
+            elif token.type not in _NON_CODE_TOKENS:
+                code_lines.update(range(token.start[0], token.end[0] + 1))
+    except (tokenize.TokenError, SyntaxError):
+        # Some test cases contain deliberate syntax errors that stop the
+        # tokenizer. Scan the rest of the file line by line.
+        scanned_lines = {lineno for lineno, _ in comments} | code_lines
+        text = source.decode("utf-8")
+        for lineno, line in enumerate(text.splitlines(), start=1):
+            if lineno in scanned_lines:
+                continue
+            code, sep, comment = line.partition("#")
+            if sep and code.strip():
+                comments.append((lineno, sep + comment))
+                code_lines.add(lineno)
+
+    return [(lineno, comment) for lineno, comment in comments if lineno in code_lines]
+
+
+def _to_json(expected_errors: ExpectedErrors, problems: Sequence[str]) -> dict[str, Any]:
+    return {
+        "lines": {str(lineno): list(counts) for lineno, counts in expected_errors.lines.items()},
+        "groups": {
+            tag: [list(linenos), allow_multiple]
+            for tag, (linenos, allow_multiple) in expected_errors.groups.items()
+        },
+        "problems": list(problems),
+    }
+
+
+def _from_json(entry: Mapping[str, Any]) -> ExpectedErrors:
+    return ExpectedErrors(
+        {int(lineno): (counts[0], counts[1]) for lineno, counts in entry["lines"].items()},
+        {
+            tag: (linenos, allow_multiple)
+            for tag, (linenos, allow_multiple) in entry["groups"].items()
+        },
+    )
@@ -0,0 +1,371 @@
+"""
+A minimal client for driving language servers over stdio.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from subprocess import DEVNULL, PIPE, Popen
+from time import perf_counter
+from typing import IO, Any, Mapping, Sequence
+
+# LSP DiagnosticSeverity values.
+SEVERITY_ERROR = 1
+SEVERITY_WARNING = 2
+SEVERITY_INFORMATION = 3
+SEVERITY_HINT = 4
+
+
+class LanguageServerError(Exception):
+    pass
+
+
+class LanguageServerClient:
+    """
+    Starts a language server process and exchanges JSON-RPC messages with
+    it over its stdin and stdout.
+    """
+
+    def __init__(
+        self,
+        command: Sequence[str],
+        root_dir: Path,
+        *,
+        initialization_options: Mapping[str, Any] | None = None,
+        settings: Mapping[str, Any] | None = None,
+        env: Mapping[str, str] | None = None,
+    ):
+        self.command = list(command)
+        self.root_dir = root_dir.resolve()
+        self.initialization_options = initialization_options
+        self.settings = settings
+        self.env = env
+        self.server_capabilities: dict[str, Any] = {}
+
+        self._process: Popen[bytes] | None = None
+        self._reader: threading.Thread | None = None
+        self._next_id = 0
+        self._write_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._responses: dict[int, dict[str, Any]] = {}
+        # Latest published diagnostics and a counter of publications per URI.
+        self._diagnostics: dict[str, list[dict[str, Any]]] = {}
+        self._publish_counts: dict[str, int] = {}
+        self._total_publish_count = 0
+        self._last_publish_time: float | None = None
+        # Whether the server has reported that it is analyzing files.
+        self._analyzing = False
+        self._document_versions: dict[str, int] = {}
+        self._closed = False
+
+    @property
+    def pid(self) -> int | None:
+        return self._process.pid if self._process else None
+
+    def start(self, *, timeout: float | None = None):
+        """
+        Starts the server and waits up to `timeout` seconds for it to
+        respond to the initialize request.
+        """
+        try:
+            self._process = Popen(
+                self.command,
+                stdin=PIPE,
+                stdout=PIPE,
+                stderr=DEVNULL,
+                cwd=self.root_dir,
+                env={**os.environ, **self.env} if self.env else None,
+            )
+        except OSError as error:
+            raise LanguageServerError(f"Cannot start {self.command[0]}: {error}") from error
+        self._reader = threading.Thread(target=self._read_messages, daemon=True)
+        self._reader.start()
+
+        result = self.request(
+            "initialize",
+            {
+                "processId": os.getpid(),
+                "rootUri": self.root_dir.as_uri(),
+                "workspaceFolders": [
+                    {"uri": self.root_dir.as_uri(), "name": self.root_dir.name}
+                ],
+                "initializationOptions": self.initialization_options,
+                "capabilities": {
+                    "textDocument": {
+                        "synchronization": {"didSave": True},
+                        "publishDiagnostics": {"versionSupport": True},
+                        "diagnostic": {"dynamicRegistration": False},
+                        "hover": {"contentFormat": ["plaintext", "markdown"]},
+                        "completion": {"completionItem": {"snippetSupport": False}},
+                    },
+                    "workspace": {
+                        "configuration": True,
+                        "workspaceFolders": True,
+                        "didChangeWatchedFiles": {"dynamicRegistration": True},
+                    },
+                },
+            },
+            timeout=timeout,
+        )
+        self.server_capabilities = result.get("capabilities", {}) if result else {}
+        self.notify("initialized", {})
+        if self.settings is not None:
+            self.notify("workspace/didChangeConfiguration", {"settings": self.settings})
+
+    def stop(self):
+        if self._process is None:
+            return
+        try:
+            self.request("shutdown", None, timeout=5)
+            self.notify("exit", None)
+            self._process.wait(timeout=5)
+        except (LanguageServerError, OSError, TimeoutError):
+            self._process.kill()
+            self._process.wait()
+        self._process = None
+
+    @property
+    def supports_pull_diagnostics(self) -> bool:
+        return bool(self.server_capabilities.get("diagnosticProvider"))
+
+    def open_document(self, path: Path):
+        uri = path.resolve().as_uri()
+        self._document_versions[uri] = 1
+        self.notify(
+            "textDocument/didOpen",
+            {
+                "textDocument": {
+                    "uri": uri,
+                    "languageId": "python",
+                    "version": 1,
+                    "text": path.read_text(encoding="utf-8"),
+                }
+            },
+        )
+
+    def change_document(self, path: Path):
+        uri = path.resolve().as_uri()
+        version = self._document_versions[uri] + 1
+        self._document_versions[uri] = version
+        self.notify(
+            "textDocument/didChange",
+            {
+                "textDocument": {"uri": uri, "version": version},
+                "contentChanges": [{"text": path.read_text(encoding="utf-8")}],
+            },
+        )
+
+    def close_document(self, path: Path):
+        uri = path.resolve().as_uri()
+        del self._document_versions[uri]
+        self.notify("textDocument/didClose", {"textDocument": {"uri": uri}})
+
+    def is_open(self, path: Path) -> bool:
+        return path.resolve().as_uri() in self._document_versions
+
+    def notify_files_changed(self, paths: Sequence[Path]):
+        # FileChangeType.Changed is 2.
+        self.notify(
+            "workspace/didChangeWatchedFiles",
+            {"changes": [{"uri": p.resolve().as_uri(), "type": 2} for p in paths]},
+        )
+
+    @property
+    def last_publish_time(self) -> float | None:
+        """
+        The `time.perf_counter` value when the server last published
+        diagnostics, or None if it has not published any yet.
+        """
+        with self._condition:
+            return self._last_publish_time
+
+    def get_publish_count(self, path: Path) -> int:
+        with self._condition:
+            return self._publish_counts.get(path.resolve().as_uri(), 0)
+
+    def get_diagnostics(
+        self,
+        path: Path,
+        *,
+        published_after: int | None = None,
+        timeout: float | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Returns the current diagnostics for an open document.
+
+        Servers that support pull diagnostics are asked for them directly.
+        For other servers, if `published_after` is given, this first waits
+        until the server has published diagnostics for the document more
+        often than that.
+        """
+        uri = path.resolve().as_uri()
+        if self.supports_pull_diagnostics:
+            result = self.request(
+                "textDocument/diagnostic",
+                {"textDocument": {"uri": uri}},
+                timeout=timeout,
+            )
+            return result.get("items", []) if result else []
+
+        with self._condition:
+            if published_after is not None and not self._condition.wait_for(
+                lambda: self._closed or self._publish_counts.get(uri, 0) > published_after,
+                timeout=timeout,
+            ):
+                raise TimeoutError(f"No diagnostics published for {path.name}")
+            if self._closed:
+                raise LanguageServerError("Language server exited")
+            return list(self._diagnostics.get(uri, []))
+
+    def hover(
+        self, path: Path, line: int, character: int, *, timeout: float | None = None
+    ) -> Any:
+        """
+        Requests the hover text at a zero-based position in an open document.
+        """
+        return self.request(
+            "textDocument/hover",
+            _text_document_position(path, line, character),
+            timeout=timeout,
+        )
+
+    def completion(
+        self, path: Path, line: int, character: int, *, timeout: float | None = None
+    ) -> Any:
+        """
+        Requests the completions at a zero-based position in an open document.
+        """
+        return self.request(
+            "textDocument/completion",
+            _text_document_position(path, line, character),
+            timeout=timeout,
+        )
+
+    def wait_until_quiet(self, quiet_period: float):
+        """
+        Waits until the server has not published any diagnostics for
+        `quiet_period` seconds and is not analyzing files. Some servers
+        publish partial or empty results first.
+        """
+        with self._condition:
+            while not self._closed:
+                count = self._total_publish_count
+                if (
+                    not self._condition.wait_for(
+                        lambda: self._closed or self._total_publish_count != count,
+                        timeout=quiet_period,
+                    )
+                    and not self._analyzing
+                ):
+                    break
+
+    def request(
+        self, method: str, params: Any, *, timeout: float | None = None
+    ) -> Any:
+        with self._condition:
+            self._next_id += 1
+            request_id = self._next_id
+        self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: request_id in self._responses or self._closed,
+                timeout=timeout,
+            ):
+                raise TimeoutError(f"No response to {method}")
+            if request_id not in self._responses:
+                raise LanguageServerError("Language server exited")
+            response = self._responses.pop(request_id)
+        if "error" in response:
+            raise LanguageServerError(f"{method} failed: {response['error']}")
+        return response.get("result")
+
+    def notify(self, method: str, params: Any):
+        self._send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def _send(self, message: Mapping[str, Any]):
+        assert self._process is not None and self._process.stdin is not None
+        body = json.dumps(message).encode("utf-8")
+        with self._write_lock:
+            try:
+                self._process.stdin.write(f"Content-Length: {len(body)}\r\n\r\n".encode())
+                self._process.stdin.write(body)
+                self._process.stdin.flush()
+            except OSError as error:
+                # The server exited, or closed its input.
+                raise LanguageServerError(f"Cannot write to language server: {error}") from error
+
+    def _read_messages(self):
+        assert self._process is not None and self._process.stdout is not None
+        stream = self._process.stdout
+        try:
+            while (message := _read_message(stream)) is not None:
+                self._handle_message(message)
+        finally:
+            with self._condition:
+                self._closed = True
+                self._condition.notify_all()
+
+    def _handle_message(self, message: dict[str, Any]):
+        method = message.get("method")
+        if method is None:
+            with self._condition:
+                self._responses[message["id"]] = message
+                self._condition.notify_all()
+        elif "id" in message:
+            # Requests from the server. Configuration requests get the
+            # requested section of the client settings (or defaults);
+            # everything else is acknowledged.
+            result: Any = None
+            if method == "workspace/configuration":
+                result = [
+                    _get_section(self.settings, item.get("section"))
+                    for item in message["params"]["items"]
+                ]
+            self._send({"jsonrpc": "2.0", "id": message["id"], "result": result})
+        elif method in ("pyright/beginProgress", "pyright/endProgress"):
+            # Pyright publishes empty diagnostics for newly opened files
+            # before it analyzes them, and reports when it is analyzing.
+            with self._condition:
+                self._analyzing = method == "pyright/beginProgress"
+                self._condition.notify_all()
+        elif method == "textDocument/publishDiagnostics":
+            uri = message["params"]["uri"]
+            with self._condition:
+                self._diagnostics[uri] = message["params"]["diagnostics"]
+                self._publish_counts[uri] = self._publish_counts.get(uri, 0) + 1
+                self._total_publish_count += 1
+                self._last_publish_time = perf_counter()
+                self._condition.notify_all()
+
+
+def _get_section(settings: Mapping[str, Any] | None, section: str | None) -> Any:
+    # Sections are dotted paths into the settings, such as "python.analysis".
+    value: Any = settings
+    for name in section.split(".") if section else ():
+        value = value.get(name) if isinstance(value, Mapping) else None
+    return value
+
+
+def _text_document_position(path: Path, line: int, character: int) -> dict[str, Any]:
+    return {
+        "textDocument": {"uri": path.resolve().as_uri()},
+        "position": {"line": line, "character": character},
+    }
+
+
+def _read_message(stream: IO[bytes]) -> dict[str, Any] | None:
+    content_length = None
+    while True:
+        header = stream.readline()
+        if not header:
+            return None
+        header = header.strip()
+        if not header:
+            break
+        name, _, value = header.decode("ascii").partition(":")
+        if name.lower() == "content-length":
+            content_length = int(value)
+    if content_length is None:
+        raise LanguageServerError("Missing Content-Length header")
+    return json.loads(stream.read(content_length))
@@ -2,22 +2,43 @@
 Type system conformance test for static type checkers.
 """
 
+import asyncio
 import contextlib
-import re
+import io
 import sys
 import tomllib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import chain, repeat
 from pathlib import Path
-from time import time
-from typing import Sequence
+from time import sleep, time
+from typing import Any, Callable, Mapping, Sequence
 
 import tomlkit
 
+from daemons import get_daemon, stop_daemons
+from expected_errors import get_expected_errors, index_expected_errors
 from options import parse_options
 from reporting import generate_summary
-from test_groups import get_test_cases, get_test_groups
-from type_checker import TYPE_CHECKERS, TypeChecker
-
-FULL_OUTPUT_KEY = "__full_output__"
+from resource_usage import (
+    ResourceLimitError,
+    ResourceLimits,
+    ResourceUsage,
+    measure_usage,
+)
+from run_cache import get_input_keys, load_input_keys, save_input_keys
+from snapshots import stage_snapshot, stage_type_checker
+from test_groups import (
+    TestGroup,
+    get_test_cases,
+    get_test_dependencies,
+    get_test_groups,
+    get_test_shards,
+)
+from type_checker import TYPE_CHECKERS, Diagnostic, TypeChecker
+
+# Language servers can report slightly different diagnostics than batch runs
+# of the same type checker, so their output is not stored as results.
+DAEMON_RESULTS_NOTE = "Results files are not updated with --daemon"
 
 
 def run_tests(
@@ -26,124 +47,357 @@ def run_tests(
     test_cases: Sequence[Path],
     *,
     verbose: bool = False,
+    shards: int = 1,
+    incremental: bool = False,
+    daemon: bool = False,
+    record_perf: bool = False,
 ):
+    if incremental:
+        # Only re-run tests whose inputs changed since their results were stored.
+        version = type_checker.get_version()
+        input_keys = get_input_keys(
+            type_checker, version, root_dir / "tests", test_cases
+        )
+        stored_keys = load_input_keys(root_dir, type_checker, version, input_keys)
+        all_test_cases = test_cases
+        test_cases = [
+            test_case
+            for test_case in test_cases
+            if stored_keys.get(test_case.name) != input_keys[test_case.name]
+        ]
+        print(
+            f"{len(all_test_cases) - len(test_cases)} of {len(all_test_cases)} "
+            f"tests are up to date for {type_checker.name}"
+        )
+        if not test_cases:
+            save_input_keys(root_dir, type_checker, stored_keys)
+            update_type_checker_info(type_checker, root_dir)
+            return
+
     print(f"Running tests for {type_checker.name}")
 
-    test_start_time = time()
-    tests_output = type_checker.run_tests([file.name for file in test_cases])
-    test_duration = time() - test_start_time
+    checked_per_file = False
+    limits_exceeded: dict[str, str] = {}
+    try:
+        if shards > 1 or daemon:
+            with measure_usage() as usage:
+                tests_output = check_tests(
+                    root_dir, type_checker, test_cases, shards=shards, daemon=daemon
+                )
+            print_usage(type_checker, usage)
+            record_results(
+                root_dir,
+                type_checker,
+                test_cases,
+                tests_output,
+                verbose=verbose,
+                write=not daemon,
+            )
+        else:
+            with measure_usage() as usage:
+                asyncio.run(
+                    stream_results(root_dir, type_checker, test_cases, verbose=verbose)
+                )
+            print_usage(type_checker, usage)
+    except ResourceLimitError as error:
+        checked_per_file = True
+        with measure_usage() as usage:
+            tests_output, limits_exceeded = run_tests_per_file(
+                type_checker, test_cases, error
+            )
+        print_usage(type_checker, usage)
+        record_results(
+            root_dir,
+            type_checker,
+            test_cases,
+            tests_output,
+            verbose=verbose,
+            limits_exceeded=limits_exceeded,
+            write=not daemon,
+        )
+
+    if daemon:
+        # Nothing was written, so leave the version, resource usage and
+        # input hashes of the stored results alone.
+        return
+
+    if incremental:
+        # Tests that exceeded a limit are re-run next time.
+        for test_case in test_cases:
+            if test_case.name in limits_exceeded:
+                stored_keys.pop(test_case.name, None)
+            else:
+                stored_keys[test_case.name] = input_keys[test_case.name]
+        save_input_keys(root_dir, type_checker, stored_keys)
+
+    # The resources used are recorded for each new version of the type
+    # checker, as timings vary too much to update them on every run.
+    if usage.processes and not checked_per_file and (
+        record_perf or _get_recorded_version(root_dir, type_checker) != type_checker.get_version()
+    ):
+        update_perf_info(type_checker, root_dir, usage, len(test_cases))
+
+    update_type_checker_info(type_checker, root_dir)
+
+
+def print_usage(type_checker: TypeChecker, usage: ResourceUsage):
+    print(f"Completed tests for {type_checker.name} in {usage.wall_time:.2f} seconds")
+    if usage.processes:
+        print(
+            f"CPU time {usage.user_time + usage.system_time:.2f} seconds "
+            f"(user {usage.user_time:.2f}, system {usage.system_time:.2f}), "
+            f"peak memory {usage.peak_rss / 2**20:.0f} MiB"
+        )
+
+
+def check_tests(
+    root_dir: Path,
+    type_checker: TypeChecker,
+    test_cases: Sequence[Path],
+    *,
+    shards: int = 1,
+    daemon: bool = False,
+) -> dict[str, list[Diagnostic]]:
+    """
+    Runs the type checker on the test cases and returns its diagnostics
+    keyed by file name.
+    """
+    checker_daemon = get_daemon(type_checker) if daemon else None
+    if checker_daemon is not None:
+        return checker_daemon.run_tests([file.name for file in test_cases])
+    if shards > 1:
+        return run_tests_in_shards(root_dir, type_checker, test_cases, shards)
+    return type_checker.run_tests([file.name for file in test_cases])
+
+
+def check_tests_within_limits(
+    root_dir: Path,
+    type_checker: TypeChecker,
+    test_cases: Sequence[Path],
+    *,
+    daemon: bool = False,
+) -> tuple[dict[str, list[Diagnostic]], dict[str, str]]:
+    """
+    Like `check_tests`, but if the type checker exceeds its resource
+    limits, each test case is checked separately. Also returns the kind
+    of limit exceeded for each test case that could not be checked.
+    """
+    try:
+        return check_tests(root_dir, type_checker, test_cases, daemon=daemon), {}
+    except ResourceLimitError as error:
+        return run_tests_per_file(type_checker, test_cases, error)
+
+
+def run_tests_per_file(
+    type_checker: TypeChecker,
+    test_cases: Sequence[Path],
+    error: ResourceLimitError,
+) -> tuple[dict[str, list[Diagnostic]], dict[str, str]]:
+    """
+    Runs a separate type checker process for each test case, after a run
+    on all of them exceeded a resource limit, to find the test cases that
+    exceed it. Returns the diagnostics keyed by file name, and the kind of
+    limit ("timeout" or "oom") exceeded by each test case that could not
+    be checked.
+    """
+    print(
+        f"{type_checker.name} exceeded its {error.kind} limit, "
+        f"checking {len(test_cases)} tests separately"
+    )
+
+    def check_file(test_case: Path) -> tuple[dict[str, list[Diagnostic]], str | None]:
+        file_checker = type_checker
+        if type_checker.working_dir is not None and type_checker.cache_dir is not None:
+            # The files are checked concurrently, so each needs its own cache.
+            file_checker = type_checker.with_directories(
+                type_checker.working_dir, type_checker.cache_dir / test_case.stem
+            )
+        try:
+            return file_checker.run_tests([test_case.name]), None
+        except ResourceLimitError as file_error:
+            return {}, file_error.kind
+
+    tests_output: dict[str, list[Diagnostic]] = {}
+    limits_exceeded: dict[str, str] = {}
+    with ThreadPoolExecutor() as executor:
+        for test_case, (file_output, kind) in zip(
+            test_cases, executor.map(check_file, test_cases)
+        ):
+            if kind is not None:
+                print(f"{test_case.name} exceeded the {kind} limit of {type_checker.name}")
+                limits_exceeded[test_case.name] = kind
+            elif test_case.name in file_output:
+                tests_output[test_case.name] = file_output[test_case.name]
+
+    return tests_output, limits_exceeded
+
+
+def get_limits(
+    type_checker: TypeChecker,
+    timeouts: Mapping[str | None, float],
+    memory_limits: Mapping[str | None, float],
+) -> ResourceLimits:
+    """
+    Returns the limits for a type checker, preferring those given for it
+    by name over those given for all type checkers. Memory limits are
+    given in MiB.
+    """
+    timeout = timeouts.get(type_checker.name, timeouts.get(None))
+    memory_limit = memory_limits.get(type_checker.name, memory_limits.get(None))
+    return ResourceLimits(
+        timeout=timeout,
+        memory=int(memory_limit * 2**20) if memory_limit is not None else None,
+    )
+
 
-    print(f"Completed tests for {type_checker.name} in {test_duration:.2f} seconds")
+def record_results(
+    root_dir: Path,
+    type_checker: TypeChecker,
+    test_cases: Sequence[Path],
+    tests_output: Mapping[str, Sequence[Diagnostic]],
+    *,
+    verbose: bool = False,
+    limits_exceeded: Mapping[str, str] | None = None,
+    write: bool = True,
+):
+    """
+    Scores the diagnostics reported by a type checker and updates the
+    results files for the test cases. `limits_exceeded` maps test cases
+    that could not be checked to the kind of limit that they exceeded.
+    If `write` is False, changes are reported but the files are left alone.
+    """
     if verbose:
         print(f"Verbose output for {type_checker.name}:")
-        full_output = tests_output.get(FULL_OUTPUT_KEY)
-        if full_output:
-            print("===== raw =====")
-            print(full_output, end="" if full_output.endswith("\n") else "\n")
+        if type_checker.full_output:
+            print_full_output(type_checker.full_output)
         else:
             for test_name in sorted(tests_output):
                 print(f"===== {test_name} =====")
-                output = tests_output[test_name]
-                if output:
-                    print(output, end="" if output.endswith("\n") else "\n")
+                print(type_checker.format_output(tests_output[test_name]), end="")
         print("")
 
-    for test_name, output in tests_output.items():
-        if test_name.startswith("__"):
-            continue
-        type_checker.parse_errors(output.splitlines())
-
     results_dir = root_dir / "results" / type_checker.name
 
     for test_case in test_cases:
         update_output_for_test(
-            type_checker, results_dir, test_case, tests_output.get(test_case.name, "")
+            type_checker,
+            results_dir,
+            test_case,
+            tests_output.get(test_case.name, []),
+            limit_exceeded=(limits_exceeded or {}).get(test_case.name),
+            write=write,
         )
 
-    update_type_checker_info(type_checker, root_dir)
-
 
-def get_expected_errors(test_case: Path) -> tuple[
-    dict[int, tuple[int, int]],
-    dict[str, tuple[list[int], bool]],
-]:
-    """Return the line numbers where type checkers are expected to produce an error.
+async def stream_results(
+    root_dir: Path,
+    type_checker: TypeChecker,
+    test_cases: Sequence[Path],
+    *,
+    verbose: bool = False,
+):
+    """
+    Runs the type checker and records the results for each test case as
+    soon as its output is available, while later files are still being
+    checked.
+    """
+    results_dir = root_dir / "results" / type_checker.name
+    test_cases_by_name = {test_case.name: test_case for test_case in test_cases}
+    outputs: dict[str, list[Diagnostic]] = {}
+
+    def record(file_name: str):
+        diagnostics = outputs[file_name]
+        if verbose and not type_checker.full_output:
+            print(f"===== {file_name} =====")
+            print(type_checker.format_output(diagnostics), end="")
+        test_case = test_cases_by_name.get(file_name)
+        if test_case is not None:
+            update_output_for_test(type_checker, results_dir, test_case, diagnostics)
+
+    # The diagnostics for a file can arrive in several parts, so a file is
+    # recorded once the type checker moves on to another file. A file that
+    # it comes back to later is recorded again with all of its diagnostics.
+    current_file: str | None = None
+    async for file_name, diagnostics in type_checker.stream_tests(list(test_cases_by_name)):
+        if file_name != current_file:
+            if current_file is not None:
+                record(current_file)
+            current_file = file_name
+        outputs.setdefault(file_name, []).extend(diagnostics)
+    if current_file is not None:
+        record(current_file)
+    if verbose and type_checker.full_output:
+        print_full_output(type_checker.full_output)
 
-    The return value is a tuple of two dictionaries:
-    - The format of the first is {line number: (number of required errors, number of optional errors)}.
-    - The format of the second is {error tag: ([lines where the error may appear], allow multiple}.
-      If allow multiple is True, the error may appear on multiple lines; otherwise, it must
-      appear exactly once.
+    for test_case in test_cases:
+        if test_case.name not in outputs:
+            update_output_for_test(type_checker, results_dir, test_case, [])
 
-    For example, the following test case:
 
-        x: int = "x"  # E
-        y: int = "y"  # E?
-        @final  # E[final]
-        def f(): pass  # E[final]
+def print_full_output(full_output: str):
+    print("===== raw =====")
+    print(full_output, end="" if full_output.endswith("\n") else "\n")
 
-    will return:
 
-        (
-            {1: (1, 0), 2: (0, 1)},
-            {"final": ([3, 4], False)}
-        )
+def run_tests_in_shards(
+    root_dir: Path,
+    type_checker: TypeChecker,
+    test_cases: Sequence[Path],
+    shards: int,
+) -> dict[str, list[Diagnostic]]:
     """
-    with open(test_case, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    output: dict[int, tuple[int, int]] = {}
-    groups: dict[str, tuple[list[int], bool]] = {}
-    for i, line in enumerate(lines, start=1):
-        line_without_comment, *_ = line.split("#")
-        # Ignore lines with no non-comment content. This allows commenting out test cases.
-        if not line_without_comment.strip():
-            continue
-        required = 0
-        optional = 0
-        for match in re.finditer(r"# E\??(?=:|$| )", line):
-            if match.group() == "# E":
-                required += 1
-            else:
-                optional += 1
-        if required or optional:
-            output[i] = (required, optional)
-        for match in re.finditer(r"# E\[([^\]]+)\]", line):
-            tag = match.group(1)
-            if tag.endswith("+"):
-                allow_multiple = True
-                tag = tag[:-1]
-            else:
-                allow_multiple = False
-            if tag not in groups:
-                groups[tag] = ([i], allow_multiple)
-            else:
-                if groups[tag][1] != allow_multiple:
-                    raise ValueError(f"Error group {tag} has inconsistent allow_multiple value in {test_case}")
-                groups[tag][0].append(i)
-    for group, linenos in groups.items():
-        if len(linenos) == 1:
-            raise ValueError(f"Error group {group} only appears on a single line in {test_case}")
-    return output, groups
+    Runs a separate type checker process for each shard of the test cases
+    and merges their output into a single dictionary keyed by file name.
+    Each shard runs in its own snapshot of the tests directory, so that
+    the shards do not write to the same caches.
+    """
+    test_shards = get_test_shards(test_cases, shards)
+    print(f"Splitting {len(test_cases)} tests into {len(test_shards)} shards")
+
+    shard_checkers = [
+        stage_type_checker(root_dir, type_checker, f"{type_checker.name}-shard{index}")
+        for index in range(len(test_shards))
+    ]
+    for shard_checker in shard_checkers:
+        # Start the shards as cold as the type checker they are part of.
+        shard_checker.clear_cache()
+
+    tests_output: dict[str, list[Diagnostic]] = {}
+    with ThreadPoolExecutor(max_workers=len(test_shards)) as executor:
+        shard_outputs = executor.map(
+            lambda shard_checker, shard: shard_checker.run_tests(
+                [file.name for file in shard]
+            ),
+            shard_checkers,
+            test_shards,
+        )
+        for shard, shard_output in zip(test_shards, shard_outputs):
+            # A file imported by tests in several shards is reported by each
+            # of them, so only keep output for files the shard was given.
+            for file in shard:
+                if file.name in shard_output:
+                    tests_output[file.name] = shard_output[file.name]
+
+    return tests_output
 
 
 def diff_expected_errors(
     type_checker: TypeChecker,
     test_case: Path,
-    output: str,
+    diagnostics: Sequence[Diagnostic],
     ignored_errors: Sequence[str],
 ) -> str:
     """Return a list of errors that were expected but not produced by the type checker."""
-    expected_errors, error_groups = get_expected_errors(test_case)
-    errors = type_checker.parse_errors(output.splitlines())
-    if ignored_errors:
-        errors = {
-            lineno: [
-                error
-                for error in errors_list
-                if not any(ignored in error for ignored in ignored_errors)]
-            for lineno, errors_list in errors.items()
-        }
-        errors = {lineno: errors_list for lineno, errors_list in errors.items() if errors_list}
+    expected = get_expected_errors(test_case)
+    expected_errors, error_groups = expected.lines, expected.groups
+    errors: dict[int, list[str]] = {}
+    for diagnostic in diagnostics:
+        if not type_checker.is_error(diagnostic):
+            continue
+        error = type_checker.describe_error(diagnostic)
+        if any(ignored in error for ignored in ignored_errors):
+            continue
+        errors.setdefault(diagnostic.line, []).append(error)
 
     differences: list[str] = []
     for expected_lineno, (expected_count, _) in expected_errors.items():
@@ -170,10 +424,13 @@ def update_output_for_test(
     type_checker: TypeChecker,
     results_dir: Path,
     test_case: Path,
-    output: str,
+    diagnostics: Sequence[Diagnostic],
+    *,
+    limit_exceeded: str | None = None,
+    write: bool = True,
 ):
     test_name = test_case.stem
-    output = f"\n{output}"
+    output = f"\n{type_checker.format_output(diagnostics)}"
 
     results_file = results_dir / f"{test_name}.toml"
     results_file.parent.mkdir(parents=True, exist_ok=True)
@@ -191,7 +448,13 @@ def update_output_for_test(
         existing_results = {}
 
     ignored_errors = existing_results.get("ignore_errors", [])
-    errors_diff = "\n" + diff_expected_errors(type_checker, test_case, output, ignored_errors)
+    if limit_exceeded is not None:
+        # The type checker was killed, so there is no output to score.
+        errors_diff = f"\nType checker exceeded its {limit_exceeded} limit\n"
+    else:
+        errors_diff = "\n" + diff_expected_errors(
+            type_checker, test_case, diagnostics, ignored_errors
+        )
     old_errors_diff = "\n" + existing_results.get("errors_diff", "")
 
     if errors_diff != old_errors_diff:
@@ -201,6 +464,13 @@ def update_output_for_test(
         print(f"New output: {errors_diff}")
         print("")
 
+    if existing_results.get("limit_exceeded") != limit_exceeded:
+        should_write = True
+        if limit_exceeded is None:
+            del existing_results["limit_exceeded"]
+        else:
+            existing_results["limit_exceeded"] = limit_exceeded
+
     conformance_automated = "Fail" if errors_diff.strip() else "Pass"
     if existing_results.get("conformance_automated") != conformance_automated:
         should_write = True
@@ -223,7 +493,7 @@ def update_output_for_test(
             if isinstance(value, str) and "\n" in value:
                 existing_results[key] = tomlkit.string(f"\n{value}", multiline=True)
 
-    if should_write:
+    if should_write and write:
         # Always reapply tomlkit.string, or it will turn into a single line.
         existing_results["errors_diff"] = tomlkit.string(errors_diff, multiline=True)
         existing_results["output"] = tomlkit.string(output, multiline=True)
@@ -258,6 +528,263 @@ def update_type_checker_info(type_checker: TypeChecker, root_dir: Path):
         tomlkit.dump(existing_info, f)
 
 
+def update_perf_info(
+    type_checker: TypeChecker,
+    root_dir: Path,
+    usage: ResourceUsage,
+    test_count: int,
+):
+    # Record the resources used by the type checker processes of the latest run.
+    perf_file = root_dir / "results" / type_checker.name / "perf.toml"
+
+    version = type_checker.get_version()
+    perf_info: dict[str, Any] = {
+        "version": version,
+        "tests": test_count,
+        "processes": usage.processes,
+        "wall_time": round(usage.wall_time, 2),
+        "user_time": round(usage.user_time, 2),
+        "system_time": round(usage.system_time, 2),
+        "peak_rss_mib": round(usage.peak_rss / 2**20, 1),
+    }
+
+    # Keep the per-file times recorded by the benchmark tool for this version.
+    try:
+        with open(perf_file, "rb") as f:
+            file_times = tomllib.load(f).get("file_times")
+    except (FileNotFoundError, tomllib.TOMLDecodeError):
+        file_times = None
+    if file_times is not None and file_times.get("version") == version:
+        perf_info["file_times"] = file_times
+
+    perf_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(perf_file, "w") as f:
+        tomlkit.dump(perf_info, f)
+
+
+def _get_recorded_version(root_dir: Path, type_checker: TypeChecker) -> str | None:
+    version_file = root_dir / "results" / type_checker.name / "version.toml"
+    try:
+        with open(version_file, "rb") as f:
+            return tomllib.load(f).get("version")
+    except (FileNotFoundError, tomllib.TOMLDecodeError):
+        return None
+
+
+def run_type_checker(
+    root_dir: Path,
+    type_checker: TypeChecker,
+    test_cases: Sequence[Path],
+    **run_options: Any,
+):
+    # Run in a snapshot of the tests directory, so that the caches of the
+    # type checker are kept apart from those of the others.
+    type_checker = stage_type_checker(root_dir, type_checker)
+    if not type_checker.install():
+        print(f"Skipping tests for {type_checker.name}")
+    else:
+        run_tests(root_dir, type_checker, test_cases, **run_options)
+
+
+def rescore_results(
+    root_dir: Path,
+    type_checker: TypeChecker,
+    test_cases: Sequence[Path],
+):
+    """
+    Recomputes the automated conformance results from the stored type
+    checker output without running the type checker.
+    """
+    results_dir = root_dir / "results" / type_checker.name
+
+    for test_case in test_cases:
+        try:
+            with open(results_dir / f"{test_case.stem}.toml", "rb") as f:
+                results = tomllib.load(f)
+        except FileNotFoundError:
+            print(f"No stored output for {test_case.stem} from {type_checker.name}")
+            continue
+        update_output_for_test(
+            type_checker,
+            results_dir,
+            test_case,
+            type_checker.parse_output(results.get("output", "")),
+            limit_exceeded=results.get("limit_exceeded"),
+        )
+
+
+def _call_buffered(function: Callable[..., None], *args: Any, **kwargs: Any) -> str:
+    # Runs in a worker process. Console output is captured and returned
+    # so that it can be printed as one block rather than interleaved with
+    # the output of other type checkers.
+    buffer = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buffer):
+            function(*args, **kwargs)
+    finally:
+        # Daemons started by a worker process do not outlive it.
+        stop_daemons()
+    return buffer.getvalue()
+
+
+def run_type_checkers_concurrently(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    test_cases: Sequence[Path],
+    *,
+    jobs: int,
+    **run_options: Any,
+):
+    print(f"Running {len(type_checkers)} type checkers with {jobs} jobs")
+
+    start_time = time()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(
+                _call_buffered,
+                run_type_checker,
+                root_dir,
+                type_checker,
+                test_cases,
+                **run_options,
+            ): type_checker
+            for type_checker in type_checkers
+        }
+        for future in as_completed(futures):
+            type_checker = futures[future]
+            print(f"===== {type_checker.name} =====")
+            print(future.result(), end="")
+    duration = time() - start_time
+
+    print(f"Completed all type checkers in {duration:.2f} seconds")
+
+
+def rescore_type_checkers(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+    test_cases: Sequence[Path],
+):
+    print(f"Rescoring stored results for {len(type_checkers)} type checkers")
+
+    start_time = time()
+    with ProcessPoolExecutor(max_workers=len(type_checkers)) as executor:
+        outputs = executor.map(
+            _call_buffered,
+            repeat(rescore_results),
+            repeat(root_dir),
+            type_checkers,
+            repeat(test_cases),
+        )
+        for output in outputs:
+            print(output, end="")
+    duration = time() - start_time
+
+    print(f"Completed rescoring in {duration:.2f} seconds")
+
+
+def watch_tests(
+    root_dir: Path,
+    test_groups: Mapping[str, TestGroup],
+    type_checkers: Sequence[TypeChecker],
+    *,
+    daemon: bool = False,
+    interval: float = 0.5,
+):
+    """
+    Polls the tests directory and re-checks each edited test case, and the
+    test cases that import an edited file, with all type checkers. Only the
+    affected results files and the summary report are updated.
+    """
+    tests_dir = root_dir / "tests"
+    type_checkers = [
+        type_checker
+        for type_checker in (
+            stage_type_checker(root_dir, type_checker) for type_checker in type_checkers
+        )
+        if type_checker.install()
+    ]
+    if not type_checkers:
+        return
+
+    print(f"Watching {tests_dir} for changes (press Ctrl+C to stop)")
+    if daemon:
+        print(f"{DAEMON_RESULTS_NOTE}; changes are only reported")
+    mtimes = _get_source_mtimes(tests_dir)
+    try:
+        while True:
+            sleep(interval)
+            new_mtimes = _get_source_mtimes(tests_dir)
+            changed = {path for path, mtime in new_mtimes.items() if mtimes.get(path) != mtime}
+            mtimes = new_mtimes
+            if not changed:
+                continue
+
+            test_cases = [
+                test_case
+                for test_case in get_test_cases(test_groups, tests_dir)
+                if test_case in changed
+                or not changed.isdisjoint(get_test_dependencies(test_case))
+            ]
+            test_cases = [
+                test_case for test_case in test_cases if _has_valid_error_tags(test_case)
+            ]
+            if not test_cases:
+                continue
+
+            print(f"Checking {', '.join(test_case.name for test_case in test_cases)}")
+            start_time = time()
+            for type_checker in type_checkers:
+                # Bring in files that were replaced or added since the
+                # snapshots were staged.
+                assert type_checker.working_dir is not None
+                stage_snapshot(tests_dir, type_checker.working_dir)
+            with ThreadPoolExecutor(max_workers=len(type_checkers)) as executor:
+                outputs = executor.map(
+                    lambda type_checker: check_tests_within_limits(
+                        root_dir, type_checker, test_cases, daemon=daemon
+                    ),
+                    type_checkers,
+                )
+                # Results are recorded as each type checker finishes, in order,
+                # so that console output is not interleaved.
+                for type_checker, (tests_output, limits_exceeded) in zip(
+                    type_checkers, outputs
+                ):
+                    record_results(
+                        root_dir,
+                        type_checker,
+                        test_cases,
+                        tests_output,
+                        limits_exceeded=limits_exceeded,
+                        write=not daemon,
+                    )
+            if daemon:
+                print(f"Checked tests in {time() - start_time:.2f} seconds")
+            else:
+                generate_summary(root_dir)
+                print(f"Updated results in {time() - start_time:.2f} seconds")
+    except KeyboardInterrupt:
+        pass
+
+
+def _has_valid_error_tags(test_case: Path) -> bool:
+    # A file can be saved in the middle of an edit, so a malformed error
+    # tag is reported and the test case skipped until it is fixed.
+    try:
+        get_expected_errors(test_case)
+    except ValueError as error:
+        print(f"Skipping {test_case.name}:\n{error}")
+        return False
+    return True
+
+
+def _get_source_mtimes(tests_dir: Path) -> dict[Path, int]:
+    return {
+        path: path.stat().st_mtime_ns
+        for path in chain(tests_dir.glob("*.py"), tests_dir.glob("*.pyi"))
+    }
+
+
 def main():
     # Some tests cover features that are available only in the
     # latest version of Python (3.12), so we need this version.
@@ -273,18 +800,73 @@ def main():
 
         test_groups = get_test_groups(root_dir)
         test_cases = get_test_cases(test_groups, tests_dir)
+        if options.tests:
+            test_cases = [
+                test_case
+                for test_case in test_cases
+                if test_case.name in options.tests or test_case.stem in options.tests
+            ]
+            if not test_cases:
+                raise SystemExit(f"No test cases match {', '.join(options.tests)}")
+
+        # Find the expected errors for all test cases once, up front.
+        try:
+            index_expected_errors(root_dir, test_cases)
+        except ValueError as error:
+            raise SystemExit(str(error))
+
+        type_checkers = [
+            type_checker
+            for type_checker in TYPE_CHECKERS
+            if not options.only_run or options.only_run == type_checker.name
+        ]
+        for type_checker in type_checkers:
+            type_checker.limits = get_limits(type_checker, options.timeouts, options.memory_limits)
+            threads = options.threads.get(type_checker.name, options.threads.get(None))
+            if threads is not None and type_checker.supports_threads:
+                type_checker.threads = threads
+
+        if options.watch:
+            try:
+                watch_tests(root_dir, test_groups, type_checkers, daemon=options.daemon)
+            finally:
+                stop_daemons()
+            return
+
+        if options.rescore:
+            rescore_type_checkers(root_dir, type_checkers, test_cases)
+            generate_summary(root_dir)
+            return
+
+        run_options = dict(
+            verbose=options.verbose,
+            shards=options.shards,
+            incremental=options.incremental,
+            daemon=options.daemon,
+            record_perf=options.record_perf,
+        )
 
-        # Switch to the tests directory.
-        with contextlib.chdir(tests_dir):
+        if options.daemon:
+            print(f"{DAEMON_RESULTS_NOTE}; changes are only reported")
 
+        try:
             # Run each test case with each type checker.
-            for type_checker in TYPE_CHECKERS:
-                if options.only_run and options.only_run != type_checker.name:
-                    continue
-                if not type_checker.install():
-                    print(f"Skipping tests for {type_checker.name}")
-                else:
-                    run_tests(root_dir, type_checker, test_cases, verbose=options.verbose)
+            if options.jobs > 1 and len(type_checkers) > 1:
+                # Each type checker writes only to its own results directory
+                # and snapshot of the tests directory, so the workers do not
+                # need to coordinate their writes.
+                run_type_checkers_concurrently(
+                    root_dir,
+                    type_checkers,
+                    test_cases,
+                    jobs=options.jobs,
+                    **run_options,
+                )
+            else:
+                for type_checker in type_checkers:
+                    run_type_checker(root_dir, type_checker, test_cases, **run_options)
+        finally:
+            stop_daemons()
 
     # Generate a summary report.
     generate_summary(root_dir)
@@ -3,8 +3,12 @@ Command-line options for the test tool.
 """
 
 import argparse
-from dataclasses import dataclass
+import os
+from dataclasses import dataclass, field
+from typing import Callable
 
+from corpus import IMPORT_SHAPES
+from stress import PROTOCOL_KINDS, RECURSIVE_ALIAS_FORMS, STRESS_FEATURES
 from type_checker import TYPE_CHECKERS
 
 @dataclass
@@ -12,6 +16,18 @@ class _Options:
     report_only: bool
     only_run: str | None
     verbose: bool
+    jobs: int
+    shards: int
+    tests: list[str] | None
+    incremental: bool
+    rescore: bool
+    daemon: bool
+    watch: bool
+    record_perf: bool
+    # Limits keyed by type checker name, or None for all type checkers.
+    timeouts: dict[str | None, float]
+    memory_limits: dict[str | None, float]
+    threads: dict[str | None, int]
 
 
 def parse_options(argv: list[str]) -> _Options:
@@ -27,10 +43,581 @@ def parse_options(argv: list[str]) -> _Options:
         help="Only runs the type checker",
         choices=[tc.name for tc in TYPE_CHECKERS],
     )
+    reporting_group.add_argument(
+        "--rescore",
+        action="store_true",
+        help="recomputes automated results from stored output without running type checkers",
+    )
     parser.add_argument(
         "--verbose",
         action="store_true",
         help="print full output from the type checker",
     )
-    ret = _Options(**vars(parser.parse_args(argv)))
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of type checkers to run concurrently",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="split the tests into this many shards, each checked by a separate process",
+    )
+    parser.add_argument(
+        "--test",
+        action="append",
+        dest="tests",
+        metavar="NAME",
+        help="only run the named test case (may be repeated)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only re-run tests whose inputs changed since their results were stored",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="check tests with a daemon or language server where one is available, "
+        "reporting changes without updating the results files; only dmypy stays warm "
+        "between runs, language servers only across the checks of --watch",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="re-check edited test files and refresh their results until interrupted",
+    )
+    parser.add_argument(
+        "--record-perf",
+        action="store_true",
+        help="record the time and memory used by each type checker even if its version is unchanged",
+    )
+    parser.add_argument(
+        "--timeout",
+        action="append",
+        dest="timeouts",
+        metavar="[CHECKER=]SECONDS",
+        help="kill type checker processes that run for longer than this (may be repeated)",
+    )
+    parser.add_argument(
+        "--memory-limit",
+        action="append",
+        dest="memory_limits",
+        metavar="[CHECKER=]MIB",
+        help="kill type checker processes that use more memory than this (may be repeated)",
+    )
+    parser.add_argument(
+        "--threads",
+        action="append",
+        metavar="[CHECKER=]COUNT",
+        help="number of threads for type checkers that support it (may be repeated)",
+    )
+    args = parser.parse_args(argv)
+    _check_conflicts(parser, args)
+    all_names = [tc.name for tc in TYPE_CHECKERS]
+    args.timeouts = _parse_per_checker(parser, "--timeout", args.timeouts, all_names)
+    args.memory_limits = _parse_per_checker(
+        parser, "--memory-limit", args.memory_limits, all_names
+    )
+    args.threads = _parse_per_checker(
+        parser,
+        "--threads",
+        args.threads,
+        [tc.name for tc in TYPE_CHECKERS if tc.supports_threads],
+        _positive_int,
+    )
+    ret = _Options(**vars(args))
+    return ret
+
+
+def _check_conflicts(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """
+    Rejects options that would be ignored in the mode that was chosen.
+    """
+    if args.daemon and args.shards > 1:
+        parser.error("--shards cannot be used with --daemon")
+    for mode, selected in (("--watch", args.watch), ("--rescore", args.rescore)):
+        if not selected:
+            continue
+        ignored = [
+            option
+            for option, given in (
+                ("--jobs", args.jobs > 1),
+                ("--shards", args.shards > 1),
+                ("--incremental", args.incremental),
+                ("--record-perf", args.record_perf),
+                ("--test", mode == "--watch" and bool(args.tests)),
+                ("--rescore", mode == "--watch" and args.rescore),
+                ("--daemon", mode == "--rescore" and args.daemon),
+            )
+            if given
+        ]
+        if ignored:
+            parser.error(f"{', '.join(ignored)} cannot be used with {mode}")
+
+
+def _parse_per_checker(
+    parser: argparse.ArgumentParser,
+    option: str,
+    values: list[str] | None,
+    names: list[str],
+    convert: Callable[[str], float] = float,
+) -> dict[str | None, float]:
+    """
+    Parses settings given as "VALUE" for all type checkers or
+    "CHECKER=VALUE" for one of the named type checkers, converting each
+    value with `convert`.
+    """
+    settings: dict[str | None, float] = {}
+    for value in values or []:
+        name, sep, setting = value.rpartition("=")
+        if sep and name not in names:
+            parser.error(f"{option}: unsupported type checker {name!r}")
+        try:
+            settings[name or None] = convert(setting)
+        except ValueError:
+            parser.error(f"{option}: invalid value {setting!r}")
+        except argparse.ArgumentTypeError as error:
+            parser.error(f"{option}: {error}")
+    return settings
+
+
+def _positive_int(value: str) -> int:
+    """
+    Parses a count that must be at least 1, such as a number of threads.
+    """
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid count: {value!r}") from None
+    if count < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1: {value!r}")
+    return count
+
+
+@dataclass
+class _BenchmarkOptions:
+    mode: str
+    only_run: str | None
+    tests: list[str] | None
+    # Options of the "suite" mode.
+    trials: int = 5
+    cache: str = "both"
+    history: str | None = None
+    alpha: float = 0.05
+    threshold: float = 0.05
+    # Options of the "files" mode.
+    jobs: int = 1
+    csv: str | None = None
+    # Options of the "startup" mode.
+    steps: int = 4
+    # Options of the "threads" mode.
+    max_threads: int = 1
+    copies: int = 4
+    # Options of the "edits" mode.
+    iterations: int = 20
+    file: str = "generics_basic.py"
+    # Options of the "lsp" mode.
+    max_sites: int = 5
+    # Options of the "scale" mode.
+    scales: list[int] = field(default_factory=lambda: [1, 10, 100])
+    shape: str = "chain"
+    # Options of the "sweep" mode.
+    features: list[str] | None = None
+    sizes: list[int] | None = None
+    max_exponent: float = 1.5
+    timeout: float = 60.0
+    # Options of the "expansion" mode.
+    max_arguments: int = 6
+    arms: list[int] = field(default_factory=lambda: [2, 3, 4])
+    max_growth: float = 4.0
+    # Options of the "aliases" mode.
+    forms: list[str] | None = None
+    depths: list[int] = field(default_factory=lambda: [2, 4, 8, 16, 32])
+    widths: list[int] = field(default_factory=lambda: [2, 8, 32])
+    # Options of the "protocols" mode.
+    kinds: list[str] | None = None
+    protocols: list[int] = field(default_factory=lambda: [1, 4])
+    members: list[int] = field(default_factory=lambda: [4, 16])
+    classes: list[int] = field(default_factory=lambda: [16, 64])
+    sites: int = 10
+
+
+def parse_benchmark_options(argv: list[str]) -> _BenchmarkOptions:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--only-run",
+        help="Only benchmarks the type checker",
+        choices=[tc.name for tc in TYPE_CHECKERS],
+    )
+    parser.add_argument(
+        "--test",
+        action="append",
+        dest="tests",
+        metavar="NAME",
+        help="only check the named test case (may be repeated)",
+    )
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    suite_parser = subparsers.add_parser(
+        "suite", help="time repeated runs of each type checker on the whole test suite"
+    )
+    suite_parser.add_argument(
+        "--trials",
+        type=_positive_int,
+        default=5,
+        help="number of timed runs of each type checker in each cache configuration",
+    )
+    suite_parser.add_argument(
+        "--cache",
+        choices=["cold", "warm", "both"],
+        default="both",
+        help="clear type checker caches before every run (cold), after a warm-up run only (warm), or both",
+    )
+    suite_parser.add_argument(
+        "--history",
+        help="file to append results to (default: benchmarks/history.jsonl)",
+    )
+    suite_parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.05,
+        help="significance level for reporting a regression against the previous version",
+    )
+    suite_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.05,
+        help="minimum relative slowdown of the median for reporting a regression",
+    )
+
+    files_parser = subparsers.add_parser(
+        "files", help="time each test file in isolation with each type checker"
+    )
+    files_parser.add_argument(
+        "--trials",
+        type=_positive_int,
+        default=3,
+        help="number of timed runs of each type checker on each file",
+    )
+    files_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=max(1, (os.cpu_count() or 2) // 2),
+        help="number of type checker processes to run concurrently",
+    )
+    files_parser.add_argument(
+        "--csv",
+        help="file to write the timing matrix to (default: benchmarks/file_times.csv)",
+    )
+
+    startup_parser = subparsers.add_parser(
+        "startup",
+        help="split the run time of each type checker into a fixed cost and a cost per file",
+    )
+    startup_parser.add_argument(
+        "--trials",
+        type=_positive_int,
+        default=3,
+        help="number of timed runs of each type checker on each corpus size",
+    )
+    startup_parser.add_argument(
+        "--steps",
+        type=int,
+        default=4,
+        help="number of corpus sizes, from a fraction of the test files up to all of them",
+    )
+    startup_parser.add_argument(
+        "--cache",
+        choices=["cold", "warm"],
+        default="cold",
+        help="clear type checker caches before every run (cold) or after a warm-up run only (warm)",
+    )
+    startup_parser.add_argument(
+        "--history",
+        help="file to append results to (default: benchmarks/history.jsonl)",
+    )
+
+    threads_parser = subparsers.add_parser(
+        "threads",
+        help="time the type checkers that can use several threads with 1, 2, 4, ... threads",
+    )
+    threads_parser.add_argument(
+        "--trials",
+        type=_positive_int,
+        default=3,
+        help="number of timed runs of each type checker with each number of threads",
+    )
+    threads_parser.add_argument(
+        "--max-threads",
+        type=_positive_int,
+        default=os.cpu_count() or 1,
+        help="largest number of threads to time (default: the number of CPUs)",
+    )
+    threads_parser.add_argument(
+        "--copies",
+        type=int,
+        default=4,
+        help="number of copies of each test file in the larger corpus",
+    )
+    threads_parser.add_argument(
+        "--history",
+        help="file to append results to (default: benchmarks/history.jsonl)",
+    )
+
+    edits_parser = subparsers.add_parser(
+        "edits",
+        help="time how long each warm type checker takes to report diagnostics after an edit",
+    )
+    edits_parser.add_argument(
+        "--iterations",
+        type=_positive_int,
+        default=20,
+        help="number of times each edit is made",
+    )
+    edits_parser.add_argument(
+        "--file",
+        default="generics_basic.py",
+        help="test file whose function body is edited (default: generics_basic.py)",
+    )
+    edits_parser.add_argument(
+        "--history",
+        help="file to append results to (default: benchmarks/history.jsonl)",
+    )
+
+    lsp_parser = subparsers.add_parser(
+        "lsp",
+        help="time diagnostics, hovers and completions from each type checker's language server",
+    )
+    lsp_parser.add_argument(
+        "--max-sites",
+        type=int,
+        default=5,
+        help="largest number of reveal_type and assert_type calls per file to query",
+    )
+    lsp_parser.add_argument(
+        "--history",
+        help="file to append results to (default: benchmarks/history.jsonl)",
+    )
+
+    scale_parser = subparsers.add_parser(
+        "scale",
+        help="time the type checkers on corpora generated from the test suite at several sizes",
+    )
+    scale_parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100],
+        help="numbers of copies of the test suite to generate (default: 1 10 100)",
+    )
+    scale_parser.add_argument(
+        "--shape",
+        choices=IMPORT_SHAPES,
+        default="chain",
+        help="how the copies import each other (default: chain)",
+    )
+    scale_parser.add_argument(
+        "--trials",
+        type=_positive_int,
+        default=1,
+        help="number of timed runs of each type checker on each corpus",
+    )
+    scale_parser.add_argument(
+        "--history",
+        help="file to append results to (default: benchmarks/history.jsonl)",
+    )
+
+    sweep_parser = subparsers.add_parser(
+        "sweep",
+        help="fit how the time of each type checker grows with the size of a type system feature",
+    )
+    sweep_parser.add_argument(
+        "--feature",
+        action="append",
+        dest="features",
+        choices=list(STRESS_FEATURES),
+        help="only sweep the named feature (may be repeated)",
+    )
+    sweep_parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        help="sizes of the features to time (default: 8 16 32 64 128, or "
+        "250 500 1000 2000 for the narrowing features)",
+    )
+    sweep_parser.add_argument(
+        "--trials",
+        type=_positive_int,
+        default=3,
+        help="number of timed runs of each type checker at each size",
+    )
+    sweep_parser.add_argument(
+        "--max-exponent",
+        type=float,
+        default=1.5,
+        help="flag time that grows faster than this power of the lines of code between "
+        "the two largest sizes (default: 1.5)",
+    )
+    sweep_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60.0,
+        help="seconds after which a run is stopped and larger sizes are skipped (default: 60)",
+    )
+    sweep_parser.add_argument(
+        "--history",
+        help="file to append results to (default: benchmarks/history.jsonl)",
+    )
+
+    expansion_parser = subparsers.add_parser(
+        "expansion",
+        help="time the type checkers on calls to overloads that need union arguments expanded",
+    )
+    expansion_parser.add_argument(
+        "--max-arguments",
+        type=int,
+        default=6,
+        help="largest number of union arguments to pass (default: 6)",
+    )
+    expansion_parser.add_argument(
+        "--arms",
+        type=int,
+        nargs="+",
+        default=[2, 3, 4],
+        help="numbers of overload signatures, and of types in each union (default: 2 3 4)",
+    )
+    expansion_parser.add_argument(
+        "--trials",
+        type=_positive_int,
+        default=3,
+        help="number of timed runs of each type checker at each step",
+    )
+    expansion_parser.add_argument(
+        "--max-growth",
+        type=float,
+        default=4.0,
+        help="flag time that grows by more than this factor from one step to the next "
+        "(default: 4)",
+    )
+    expansion_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60.0,
+        help="seconds after which a run is stopped and larger steps are skipped (default: 60)",
+    )
+    expansion_parser.add_argument(
+        "--history",
+        help="file to append results to (default: benchmarks/history.jsonl)",
+    )
+
+    aliases_parser = subparsers.add_parser(
+        "aliases",
+        help="time the type checkers on nested values assigned to recursive type aliases",
+    )
+    aliases_parser.add_argument(
+        "--form",
+        action="append",
+        dest="forms",
+        choices=list(RECURSIVE_ALIAS_FORMS),
+        help="only time the named spelling of the recursive alias (may be repeated)",
+    )
+    aliases_parser.add_argument(
+        "--depths",
+        type=int,
+        nargs="+",
+        default=[2, 4, 8, 16, 32],
+        help="nesting depths of the values to time (default: 2 4 8 16 32)",
+    )
+    aliases_parser.add_argument(
+        "--widths",
+        type=int,
+        nargs="+",
+        default=[2, 8, 32],
+        help="numbers of items at each level of the values (default: 2 8 32)",
+    )
+    aliases_parser.add_argument(
+        "--trials",
+        type=_positive_int,
+        default=3,
+        help="number of timed runs of each type checker on each value",
+    )
+    aliases_parser.add_argument(
+        "--max-exponent",
+        type=float,
+        default=1.5,
+        help="flag time that grows faster than this power of the depth between the two "
+        "largest depths (default: 1.5)",
+    )
+    aliases_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60.0,
+        help="seconds after which a run is stopped and larger depths are skipped (default: 60)",
+    )
+    aliases_parser.add_argument(
+        "--history",
+        help="file to append results to (default: benchmarks/history.jsonl)",
+    )
+
+    protocols_parser = subparsers.add_parser(
+        "protocols",
+        help="time the type checkers on matching many classes against generic protocols",
+    )
+    protocols_parser.add_argument(
+        "--kind",
+        action="append",
+        dest="kinds",
+        choices=PROTOCOL_KINDS,
+        help="only time the named kind of protocol (may be repeated)",
+    )
+    protocols_parser.add_argument(
+        "--protocols",
+        type=int,
+        nargs="+",
+        default=[1, 4],
+        help="numbers of protocols to generate (default: 1 4)",
+    )
+    protocols_parser.add_argument(
+        "--members",
+        type=int,
+        nargs="+",
+        default=[4, 16],
+        help="numbers of members of each protocol (default: 4 16)",
+    )
+    protocols_parser.add_argument(
+        "--classes",
+        type=int,
+        nargs="+",
+        default=[16, 64],
+        help="numbers of classes that implement the protocols (default: 16 64)",
+    )
+    protocols_parser.add_argument(
+        "--sites",
+        type=int,
+        default=10,
+        help="number of times each class is passed as each protocol, to see whether "
+        "matches are cached (default: 10)",
+    )
+    protocols_parser.add_argument(
+        "--trials",
+        type=_positive_int,
+        default=3,
+        help="number of timed runs of each type checker on each file",
+    )
+    protocols_parser.add_argument(
+        "--timeout",
+        type=float,
+        default=60.0,
+        help="seconds after which a run is stopped (default: 60)",
+    )
+    protocols_parser.add_argument(
+        "--history",
+        help="file to append results to (default: benchmarks/history.jsonl)",
+    )
+    ret = _BenchmarkOptions(**vars(parser.parse_args(argv)))
     return ret
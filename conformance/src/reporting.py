@@ -5,10 +5,11 @@ Generates a summary of the type checker conformant tests.
 import itertools
 import operator
 import tomllib
-from collections.abc import Sequence
+from collections.abc import Mapping, Sequence
 from dataclasses import dataclass, field
 from decimal import Decimal
 from pathlib import Path
+from typing import Any
 
 import jinja2
 import markdown
@@ -25,10 +26,19 @@ class TestResult:
     notes: list[markupsafe.Markup] = field(default_factory=list)
 
 
+@dataclass(frozen=True, kw_only=True, slots=True)
+class TestTiming:
+    type_checker: str
+    milliseconds: float | None
+    # The time relative to the slowest test for the type checker, from 0 to 1.
+    heat: float = 0.0
+
+
 @dataclass(frozen=True, kw_only=True, slots=True)
 class TestCase:
     name: str
     results: list[TestResult] = field(default_factory=list)
+    timings: list[TestTiming] = field(default_factory=list)
 
 
 @dataclass(frozen=True, kw_only=True, slots=True)
@@ -50,6 +60,7 @@ class TestGroup:
     paths: list[Path] = field(default_factory=list)
     cases: list[TestCase] = field(default_factory=list)
     stats: list[TestStat] = field(default_factory=list)
+    timing_totals: list[float] = field(default_factory=list)
 
 
 def generate_summary(root_dir: Path):
@@ -66,11 +77,27 @@ def generate_summary(root_dir: Path):
 
     type_checkers = sorted(TYPE_CHECKERS, key=operator.attrgetter("name"))
 
-    groups = _get_groups(root_dir, type_checkers)
+    file_times = _get_file_times(root_dir, type_checkers)
+    groups = _get_groups(root_dir, type_checkers, file_times)
     totals = _get_totals(groups)
     versions = _get_versions(root_dir, type_checkers)
-
-    results = template.render(groups=groups, totals=totals, versions=versions)
+    timing_versions = [
+        version
+        for type_checker, version in zip(type_checkers, versions)
+        if type_checker.name in file_times
+    ]
+    timing_totals = [
+        round(sum(group.timing_totals[n] for group in groups), 1)
+        for n in range(len(timing_versions))
+    ]
+
+    results = template.render(
+        groups=groups,
+        totals=totals,
+        versions=versions,
+        timing_versions=timing_versions,
+        timing_totals=timing_totals,
+    )
 
     root_dir.joinpath("results", "results.html").write_text(results)
 
@@ -86,6 +113,7 @@ def _conformance_class(value: str) -> str:
 def _get_groups(
     root_dir: Path,
     type_checkers: Sequence[TypeChecker],
+    file_times: Mapping[str, Mapping[str, float]],
 ) -> list[TestGroup]:
     test_groups = get_test_groups(root_dir)
     test_cases = get_test_cases(test_groups, root_dir / "tests")
@@ -122,11 +150,7 @@ def _get_groups(
                 result_path = (
                     root_dir / "results" / type_checker.name / f"{case.name}.toml"
                 )
-                try:
-                    with result_path.open("rb") as f:
-                        data = tomllib.load(f)
-                except FileNotFoundError:
-                    data = {}
+                data = _load_result(result_path)
 
                 conformance = data.get("conformant")
                 if not conformance:
@@ -150,6 +174,21 @@ def _get_groups(
                 )
                 case.results.append(result)
 
+            for type_checker in type_checkers:
+                times = file_times.get(type_checker.name)
+                if times is None:
+                    continue
+                milliseconds = times.get(case.name)
+                slowest = max(times.values(), default=0.0)
+                timing = TestTiming(
+                    type_checker=type_checker.name,
+                    milliseconds=milliseconds,
+                    heat=round(milliseconds / slowest, 2)
+                    if milliseconds is not None and slowest > 0
+                    else 0.0,
+                )
+                case.timings.append(timing)
+
         for n, type_checker in enumerate(type_checkers):
             passed = Decimal("0.0")
 
@@ -168,9 +207,63 @@ def _get_groups(
             )
             group.stats.append(stat)
 
+        for n in range(len(file_times)):
+            group.timing_totals.append(
+                round(sum(case.timings[n].milliseconds or 0.0 for case in group.cases), 1)
+            )
+
     return groups
 
 
+# Parsed results files keyed by path, with the modification time they were
+# read at, so that regenerating the report only re-reads changed files.
+_result_cache: dict[Path, tuple[int, dict[str, Any]]] = {}
+
+
+def _load_result(result_path: Path) -> dict[str, Any]:
+    try:
+        mtime = result_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}
+
+    cached = _result_cache.get(result_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with result_path.open("rb") as f:
+        data = tomllib.load(f)
+    _result_cache[result_path] = (mtime, data)
+    return data
+
+
+def _get_file_times(
+    root_dir: Path,
+    type_checkers: Sequence[TypeChecker],
+) -> dict[str, dict[str, float]]:
+    """
+    Returns the time in milliseconds taken for each test, keyed by type
+    checker name and test name, for the type checkers whose times have
+    been recorded by the benchmark tool for their current version.
+    """
+    file_times: dict[str, dict[str, float]] = {}
+
+    for type_checker in type_checkers:
+        results_dir = root_dir / "results" / type_checker.name
+        try:
+            with results_dir.joinpath("perf.toml").open("rb") as f:
+                times = tomllib.load(f).get("file_times")
+            with results_dir.joinpath("version.toml").open("rb") as f:
+                version = tomllib.load(f).get("version")
+        except (FileNotFoundError, tomllib.TOMLDecodeError):
+            continue
+
+        # Times recorded for an older version are out of date.
+        if times is not None and times.get("version") == version:
+            file_times[type_checker.name] = times.get("tests", {})
+
+    return file_times
+
+
 def _get_totals(groups: list[TestGroup]) -> list[TestStat]:
     totals = []
 
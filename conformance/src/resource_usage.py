@@ -0,0 +1,346 @@
+"""
+Measures and limits the time, CPU and memory used by type checker
+processes.
+"""
+
+import os
+import signal
+import sys
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from subprocess import CompletedProcess, Popen
+from time import monotonic, perf_counter
+from typing import IO, Any, Iterator, Mapping, Sequence
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
+
+
+@dataclass
+class ResourceUsage:
+    """
+    The resources used by the type checker processes of a run. CPU times
+    are summed over all processes, and the peak memory is that of the
+    largest process.
+    """
+
+    wall_time: float = 0.0
+    user_time: float = 0.0
+    system_time: float = 0.0
+    # Peak resident set size in bytes.
+    peak_rss: int = 0
+    processes: int = 0
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    """
+    Limits on each type checker process. The timeout is in seconds of wall
+    time, and the memory limit is in bytes of resident memory, summed over
+    the process and any processes that it starts. Memory limits are only
+    enforced on Linux, where the kernel also refuses to let any one of the
+    processes allocate more data than the limit.
+    """
+
+    timeout: float | None = None
+    memory: int | None = None
+
+
+class ResourceLimitError(Exception):
+    """
+    Raised when a process was killed because it exceeded a limit. `kind`
+    is "timeout" or "oom".
+    """
+
+    def __init__(self, kind: str, command: Sequence[str]):
+        super().__init__(f"{' '.join(command)} exceeded its {kind} limit")
+        self.kind = kind
+
+
+_lock = threading.Lock()
+# Usages being measured, with the thread they are limited to, if any.
+_active_usages: list[tuple[ResourceUsage, int | None]] = []
+
+
+@contextmanager
+def measure_usage(*, current_thread_only: bool = False) -> Iterator[ResourceUsage]:
+    """
+    Adds up the resources used by the processes that finish within the
+    context, and records the elapsed wall time when the context exits.
+    If `current_thread_only` is True, only processes that are waited for
+    on the current thread are counted, so that runs made concurrently on
+    other threads can be measured separately.
+    """
+    usage = ResourceUsage()
+    entry = (usage, threading.get_ident() if current_thread_only else None)
+    with _lock:
+        _active_usages.append(entry)
+    start_time = perf_counter()
+    try:
+        yield usage
+    finally:
+        usage.wall_time = perf_counter() - start_time
+        with _lock:
+            _active_usages.remove(entry)
+
+
+# Watchdogs of the running processes that have limits, keyed by process ID.
+_watchdogs: dict[int, "_Watchdog"] = {}
+
+
+def start_process(
+    command: Sequence[str], *, limits: ResourceLimits | None = None, **popen_args: Any
+) -> Popen[Any]:
+    """
+    Starts a process like `subprocess.Popen`. If the process exceeds the
+    limits, its process group is killed, and `wait_process` raises a
+    ResourceLimitError.
+    """
+    if limits is None or (limits.timeout is None and limits.memory is None):
+        return Popen(command, **popen_args)
+
+    # Start a new process group, so that any processes that the type
+    # checker starts (such as Node for pyright) are killed with it.
+    proc = Popen(command, start_new_session=True, **popen_args)
+    data_limited = limits.memory is not None and _limit_data(proc.pid, limits.memory)
+    watchdog = _Watchdog(proc, limits, data_limited)
+    with _lock:
+        _watchdogs[proc.pid] = watchdog
+    watchdog.start()
+    return proc
+
+
+def run_process(
+    command: Sequence[str],
+    *,
+    stdout: int | None = None,
+    stderr: int | None = None,
+    env: Mapping[str, str] | None = None,
+    cwd: Path | None = None,
+    limits: ResourceLimits | None = None,
+) -> CompletedProcess[str]:
+    """
+    Like `subprocess.run` with UTF-8 text output, but also records the
+    resources used by the process and enforces the limits.
+    """
+    with start_process(
+        command,
+        limits=limits,
+        stdout=stdout,
+        stderr=stderr,
+        text=True,
+        encoding="utf-8",
+        env=env,
+        cwd=cwd,
+    ) as proc:
+        # Read stderr on another thread, so that the process cannot block
+        # on a full pipe while stdout is being read.
+        stderr_output: list[str] = []
+        stderr_reader = None
+        if proc.stderr is not None:
+            stderr_reader = threading.Thread(
+                target=_read_stream, args=(proc.stderr, stderr_output)
+            )
+            stderr_reader.start()
+        stdout_output = proc.stdout.read() if proc.stdout is not None else None
+        if stderr_reader is not None:
+            stderr_reader.join()
+        wait_process(proc)
+
+    return CompletedProcess(
+        command,
+        proc.returncode,
+        stdout_output,
+        stderr_output[0] if stderr_output else None,
+    )
+
+
+def wait_process(proc: Popen[Any]) -> int:
+    """
+    Waits for a process to exit and records the resources that it used.
+    Returns its exit code, or raises a ResourceLimitError if the process
+    was killed for exceeding its limits.
+    """
+    if not hasattr(os, "wait4"):
+        # Resource usage of child processes is not available on Windows.
+        proc.wait()
+        _check_limits(proc)
+        return proc.returncode
+
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    peak_rss = rusage.ru_maxrss if sys.platform == "darwin" else rusage.ru_maxrss * 1024
+    thread_id = threading.get_ident()
+    with _lock:
+        for usage, usage_thread_id in _active_usages:
+            if usage_thread_id is not None and usage_thread_id != thread_id:
+                continue
+            usage.user_time += rusage.ru_utime
+            usage.system_time += rusage.ru_stime
+            usage.peak_rss = max(usage.peak_rss, peak_rss)
+            usage.processes += 1
+
+    _check_limits(proc)
+    return proc.returncode
+
+
+def _check_limits(proc: Popen[Any]):
+    with _lock:
+        watchdog = _watchdogs.pop(proc.pid, None)
+    if watchdog is None:
+        return
+    watchdog.stop()
+    if watchdog.exceeded is not None:
+        raise ResourceLimitError(watchdog.exceeded, proc.args)
+    # A process whose allocation is refused by the data limit aborts (Node
+    # with "heap out of memory", and the Rust type checkers with "memory
+    # allocation failed") before the watchdog sees its memory grow.
+    if watchdog.data_limited and proc.returncode == -signal.SIGABRT:
+        raise ResourceLimitError("oom", proc.args)
+
+
+def _limit_data(pid: int, memory: int) -> bool:
+    """
+    Limits the data segment of a running process, which includes its heap
+    and private memory maps, and is inherited by the processes that it
+    starts. Returns whether the limit was set, which is only possible on
+    Linux. The address space limit is not used, since Node and the Rust
+    type checkers reserve far more address space than they ever use.
+    """
+    # prlimit is used rather than setting the limit in preexec_fn, which
+    # is not safe while other threads are starting processes too.
+    if resource is None or not hasattr(resource, "prlimit"):
+        return False
+    try:
+        resource.prlimit(pid, resource.RLIMIT_DATA, (memory, memory))
+    except (OSError, ValueError):
+        # The process has already exited, or the limit is above the hard
+        # limit of this process.
+        return False
+    return True
+
+
+class _Watchdog:
+    """
+    Kills the process group of a process that runs for longer or uses more
+    memory than its limits allow. Where the kernel also limits the data of
+    each process, the memory check mostly catches process groups that use
+    too much memory between them.
+    """
+
+    # Seconds between checks of the process.
+    interval = 0.1
+
+    def __init__(self, proc: Popen[Any], limits: ResourceLimits, data_limited: bool):
+        self.exceeded: str | None = None
+        # Whether the kernel limits the data of the process too.
+        self.data_limited = data_limited
+        self._proc = proc
+        self._limits = limits
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _watch(self):
+        timeout = self._limits.timeout
+        deadline = monotonic() + timeout if timeout is not None else None
+        while not self._stopped.wait(self.interval):
+            if deadline is not None and monotonic() >= deadline:
+                self._kill("timeout")
+                return
+            memory = self._limits.memory
+            if memory is not None and _get_group_rss(self._proc.pid) > memory:
+                self._kill("oom")
+                return
+
+    def _kill(self, kind: str):
+        self.exceeded = kind
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(self._proc.pid, signal.SIGKILL)
+            else:
+                self._proc.kill()
+        except ProcessLookupError:
+            # The process has already exited.
+            pass
+
+
+def _get_group_rss(process_group: int) -> int:
+    """
+    Returns the resident memory in bytes of all processes in a process
+    group. Returns 0 on platforms without /proc.
+    """
+    return sum(
+        process.rss for process in _get_processes() if process.group == process_group
+    )
+
+
+def get_tree_rss(pid: int) -> int:
+    """
+    Returns the resident memory in bytes of a process and all of its
+    descendants, such as the Node process that runs a language server.
+    Returns 0 on platforms without /proc.
+    """
+    processes = _get_processes()
+    tree = {pid}
+    # Parents may be listed after their children, so repeat until no more
+    # descendants are found.
+    while True:
+        children = {
+            process.pid
+            for process in processes
+            if process.parent in tree and process.pid not in tree
+        }
+        if not children:
+            break
+        tree |= children
+    return sum(process.rss for process in processes if process.pid in tree)
+
+
+@dataclass(frozen=True)
+class _ProcessInfo:
+    pid: int
+    parent: int
+    group: int
+    # Resident set size in bytes.
+    rss: int
+
+
+def _get_processes() -> list[_ProcessInfo]:
+    page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 0
+    processes: list[_ProcessInfo] = []
+    for stat_file in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            stat = stat_file.read_text()
+        except OSError:
+            # The process has exited.
+            continue
+        # The command name may contain spaces, so split after it.
+        fields = stat[stat.rfind(")") + 2 :].split()
+        # Fields 4 (ppid), 5 (pgrp) and 24 (rss) of /proc/<pid>/stat.
+        processes.append(
+            _ProcessInfo(
+                int(stat_file.parent.name),
+                int(fields[1]),
+                int(fields[2]),
+                int(fields[21]) * page_size,
+            )
+        )
+    return processes
+
+
+def _read_stream(stream: IO[str], output: list[str]):
+    output.append(stream.read())
@@ -0,0 +1,101 @@
+"""
+Tracks the inputs that produced each stored test result so that
+incremental runs only re-run the type checker on tests whose inputs
+have changed.
+"""
+
+import hashlib
+import json
+import tomllib
+from pathlib import Path
+from typing import Mapping, Sequence
+
+from test_groups import get_test_dependencies
+from type_checker import TypeChecker
+
+
+def get_input_keys(
+    type_checker: TypeChecker,
+    version: str,
+    tests_dir: Path,
+    test_cases: Sequence[Path],
+) -> dict[str, str]:
+    """
+    Returns a key for each test case that changes whenever the test file,
+    a module or stub it imports, the type checker version or the type
+    checker configuration changes.
+    """
+    config_hash = hashlib.sha256()
+    config_hash.update(version.encode())
+    # Hash the command line without any test files to capture the flags.
+    config_hash.update(json.dumps(type_checker.get_command([])).encode())
+    for config_file in type_checker.get_config_files():
+        path = tests_dir / config_file
+        config_hash.update(config_file.encode())
+        config_hash.update(path.read_bytes() if path.is_file() else b"")
+    config_digest = config_hash.digest()
+
+    input_keys: dict[str, str] = {}
+    for test_case in test_cases:
+        test_hash = hashlib.sha256(config_digest)
+        for path in (test_case, *get_test_dependencies(test_case)):
+            test_hash.update(path.name.encode())
+            test_hash.update(path.read_bytes())
+        input_keys[test_case.name] = test_hash.hexdigest()
+
+    return input_keys
+
+
+def load_input_keys(
+    root_dir: Path,
+    type_checker: TypeChecker,
+    version: str,
+    input_keys: Mapping[str, str],
+) -> dict[str, str]:
+    """
+    Returns the input keys recorded for the stored results of a type checker.
+
+    If nothing has been recorded yet, the committed results are assumed to
+    be up to date when they were produced by the same type checker version,
+    so a fresh clone does not need to re-run anything.
+    """
+    cache_file = _get_cache_file(root_dir, type_checker)
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except json.JSONDecodeError:
+        print(f"Error decoding {cache_file}")
+        return {}
+
+    results_dir = root_dir / "results" / type_checker.name
+    try:
+        with open(results_dir / "version.toml", "rb") as f:
+            recorded_version = tomllib.load(f).get("version")
+    except (FileNotFoundError, tomllib.TOMLDecodeError):
+        return {}
+    if recorded_version != version:
+        return {}
+
+    return {
+        test_name: input_key
+        for test_name, input_key in input_keys.items()
+        if (results_dir / f"{Path(test_name).stem}.toml").is_file()
+    }
+
+
+def save_input_keys(
+    root_dir: Path,
+    type_checker: TypeChecker,
+    input_keys: Mapping[str, str],
+):
+    cache_file = _get_cache_file(root_dir, type_checker)
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_file, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(input_keys.items())), f, indent=2)
+
+
+def _get_cache_file(root_dir: Path, type_checker: TypeChecker) -> Path:
+    # One file per type checker, so concurrent runs never write the same file.
+    return root_dir / ".cache" / "runs" / f"{type_checker.name}.json"
@@ -0,0 +1,98 @@
+"""
+Stages snapshots of the tests directory in which the type checkers run,
+so that runs of different type checkers, or of shards of the tests, do not
+share the caches and other files that they write, and so that the tests
+directory itself stays free of them.
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+from type_checker import TypeChecker
+
+
+def get_snapshot_dir(root_dir: Path, name: str) -> Path:
+    """
+    Returns the directory that holds the snapshot with the given name.
+    Snapshots are kept between runs, so that caches and daemons keep
+    working, and are not under a hidden directory, because some type
+    checkers skip files in hidden directories.
+    """
+    return root_dir / "snapshots" / name
+
+
+def stage_snapshot(tests_dir: Path, snapshot_dir: Path):
+    """
+    Makes `snapshot_dir` mirror the test files and configuration files of
+    the tests directory. Each file is hard-linked rather than copied where
+    the file system allows it, which is safe because the type checkers only
+    read these files. Files that are already linked to the current version
+    of a file are left alone, and files that were removed from the tests
+    directory are removed from the snapshot. Other files in the snapshot,
+    such as caches, are kept.
+    """
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    sources = {
+        path.name: path
+        for path in tests_dir.iterdir()
+        if path.is_file() and not path.name.startswith(".")
+    }
+
+    for path in snapshot_dir.iterdir():
+        if path.is_file() and not path.name.startswith(".") and path.name not in sources:
+            path.unlink()
+
+    for name, source in sources.items():
+        _link_file(source, snapshot_dir / name)
+
+
+def _link_file(source: Path, target: Path):
+    if target.exists():
+        if os.path.samefile(source, target):
+            return
+        # The file was replaced, rather than written in place, since it was
+        # linked, so link the new version.
+        target.unlink()
+    try:
+        os.link(source, target)
+    except OSError:
+        # Hard links are not supported, for example across file systems.
+        shutil.copy2(source, target)
+
+
+def stage_type_checker(
+    root_dir: Path, type_checker: TypeChecker, name: str | None = None
+) -> TypeChecker:
+    """
+    Stages a snapshot of the tests directory for a type checker and returns
+    a copy of the type checker that runs in it. Runs that should not share
+    a snapshot, such as the shards of a run, are given different names.
+    """
+    snapshot_dir = get_snapshot_dir(root_dir, name or type_checker.name)
+    working_dir = snapshot_dir / "tests"
+    stage_snapshot(root_dir / "tests", working_dir)
+    # Some type checkers find the root of the project, which names the
+    # modules of the tests and sets the Python version, from the project
+    # file above the tests directory.
+    project_file = snapshot_dir / "pyproject.toml"
+    settings = type_checker.get_project_settings()
+    if settings:
+        project = (root_dir / "pyproject.toml").read_text(encoding="utf-8")
+        _write_file(project_file, f"{project}\n{settings}")
+    else:
+        _link_file(root_dir / "pyproject.toml", project_file)
+    return type_checker.with_directories(working_dir, snapshot_dir / "cache")
+
+
+def _write_file(target: Path, contents: str):
+    if (
+        target.exists()
+        and target.stat().st_nlink == 1
+        and target.read_text(encoding="utf-8") == contents
+    ):
+        return
+    # Replace the file, rather than write through a hard link to the project
+    # file of the repository.
+    target.unlink(missing_ok=True)
+    target.write_text(contents, encoding="utf-8")
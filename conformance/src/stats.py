@@ -0,0 +1,153 @@
+"""
+Summary statistics and significance tests for benchmark timings.
+"""
+
+import itertools
+import math
+import statistics
+from collections import defaultdict
+from dataclasses import dataclass
+from functools import cache
+from typing import Sequence
+
+
+@dataclass(frozen=True)
+class Summary:
+    """
+    A robust summary of repeated measurements. The median and
+    interquartile range are used rather than the mean and standard
+    deviation because timings have a long tail of slow outliers.
+    """
+
+    median: float
+    iqr: float
+    min: float
+    count: int
+
+
+def summarize(samples: Sequence[float]) -> Summary:
+    if not samples:
+        raise ValueError("Cannot summarize an empty list of samples")
+    if len(samples) >= 2:
+        q1, _, q3 = statistics.quantiles(samples, n=4, method="inclusive")
+        iqr = q3 - q1
+    else:
+        iqr = 0.0
+    return Summary(statistics.median(samples), iqr, min(samples), len(samples))
+
+
+def percentiles(samples: Sequence[float], points: Sequence[int]) -> list[float]:
+    """
+    Returns the given percentiles (from 1 to 99) of the samples.
+    """
+    if not samples:
+        raise ValueError("Cannot take percentiles of an empty list of samples")
+    if len(samples) < 2:
+        return [samples[0] for _ in points]
+    cut_points = statistics.quantiles(samples, n=100, method="inclusive")
+    return [cut_points[point - 1] for point in points]
+
+
+def mann_whitney_p(baseline: Sequence[float], candidate: Sequence[float]) -> float:
+    """
+    Returns the one-sided p-value of a Mann-Whitney U test for the
+    hypothesis that the candidate samples tend to be larger than the
+    baseline samples. The test makes no assumption about the shape of the
+    distributions, which suits timings. Ties are counted as half, and the
+    p-value is computed from the exact distribution of U over all the
+    ways of splitting the samples, keeping the tied values as they are.
+    """
+    m, n = len(baseline), len(candidate)
+    if not m or not n:
+        return 1.0
+
+    # U is the number of (baseline, candidate) pairs in which the
+    # candidate is larger, doubled so that ties count as 1 rather than 0.5.
+    twice_u = sum(
+        2 if c > b else 1 if c == b else 0 for c in candidate for b in baseline
+    )
+    tie_sizes = [
+        len(list(group)) for _, group in itertools.groupby(sorted([*baseline, *candidate]))
+    ]
+    if max(tie_sizes) == 1:
+        counts = _u_counts(m, n)
+        at_least = sum(counts[twice_u // 2 :])
+    else:
+        ties = _twice_u_counts(tie_sizes, n)
+        at_least = sum(count for value, count in ties.items() if value >= twice_u)
+    return at_least / math.comb(m + n, n)
+
+
+@cache
+def _u_counts(m: int, n: int) -> tuple[int, ...]:
+    """
+    Returns the number of orderings of m baseline and n candidate samples
+    without ties that give each value of U, indexed by U.
+    """
+    if m == 0 or n == 0:
+        return (1,)
+    # The largest sample is either a candidate, which is larger than all m
+    # baseline samples, or a baseline sample, which adds nothing to U.
+    counts = [0] * (m * n + 1)
+    for u, count in enumerate(_u_counts(m, n - 1)):
+        counts[u + m] += count
+    for u, count in enumerate(_u_counts(m - 1, n)):
+        counts[u] += count
+    return tuple(counts)
+
+
+def _twice_u_counts(tie_sizes: Sequence[int], n: int) -> dict[int, int]:
+    """
+    Returns the number of ways of choosing n candidates from samples with
+    the given numbers of tied values, in increasing order of value, that
+    give each value of 2U. This is slower than `_u_counts`, so it is only
+    used when there are ties.
+    """
+    # Ways of choosing the candidates among the values so far, keyed by
+    # the number of candidates chosen and 2U.
+    ways: dict[tuple[int, int], int] = {(0, 0): 1}
+    seen = 0
+    for size in tie_sizes:
+        next_ways: defaultdict[tuple[int, int], int] = defaultdict(int)
+        for (chosen, twice_u), count in ways.items():
+            smaller = seen - chosen
+            for new in range(min(size, n - chosen) + 1):
+                # Each new candidate is larger than the baseline samples
+                # seen so far and tied with the others of this value.
+                value = twice_u + new * (2 * smaller + size - new)
+                next_ways[chosen + new, value] += count * math.comb(size, new)
+        ways = next_ways
+        seen += size
+    return {twice_u: count for (chosen, twice_u), count in ways.items() if chosen == n}
+
+
+@dataclass(frozen=True)
+class LinearFit:
+    """
+    A least-squares fit of y = intercept + slope * x.
+    """
+
+    intercept: float
+    slope: float
+    r_squared: float
+
+
+def fit_linear(xs: Sequence[float], ys: Sequence[float]) -> LinearFit:
+    slope, intercept = statistics.linear_regression(xs, ys)
+    try:
+        r_squared = statistics.correlation(xs, ys) ** 2
+    except statistics.StatisticsError:
+        # All the y values are equal, so the line fits them exactly.
+        r_squared = 1.0
+    return LinearFit(intercept, slope, r_squared)
+
+
+def fit_power_law(xs: Sequence[float], ys: Sequence[float]) -> LinearFit:
+    """
+    Fits y = a * x ** k by fitting a line to the logarithms of the values.
+    The slope of the returned fit is the exponent k, and its intercept is
+    the logarithm of a. All values must be positive.
+    """
+    if any(value <= 0 for value in (*xs, *ys)):
+        raise ValueError("Cannot fit a power law to values that are not positive")
+    return fit_linear([math.log(x) for x in xs], [math.log(y) for y in ys])
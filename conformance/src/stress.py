@@ -0,0 +1,368 @@
+"""
+Generates test files that stress one feature of the type system at a
+given size, such as a union of N literals or an overload with N
+signatures. Timing the type checkers on growing sizes shows how their
+cost grows with the size of the feature.
+
+The generated files are meant to type check without errors, so that the
+time is spent checking the feature rather than reporting errors.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Mapping
+
+
+@dataclass(frozen=True)
+class StressFeature:
+    """
+    A feature of the type system and a function that returns the source
+    of a test file that uses it at a given size.
+    """
+
+    name: str
+    description: str
+    generate: Callable[[int], str]
+    # The sizes swept unless others are given.
+    sizes: tuple[int, ...] = (8, 16, 32, 64, 128)
+
+
+def _literal_match(size: int) -> str:
+    # Each case narrows the remaining members of the union.
+    values = ", ".join(f'"v{index}"' for index in range(size))
+    lines = [
+        "from typing import Literal, assert_never",
+        "",
+        f"Value = Literal[{values}]",
+        "",
+        "",
+        "def check(value: Value) -> int:",
+        "    match value:",
+    ]
+    for index in range(size):
+        lines += [f'        case "v{index}":', f"            return {index}"]
+    lines += ["        case _:", "            assert_never(value)"]
+    return "\n".join(lines) + "\n"
+
+
+def _overloads(size: int) -> str:
+    # Calling with a union argument makes the type checker try every member
+    # of the union against the overloads.
+    lines = ["from typing import overload"]
+    for index in range(size):
+        lines += ["", "", f"class Arg{index}: ...", "", "", f"class Result{index}: ..."]
+    for index in range(size):
+        lines += ["", "", "@overload", f"def func(x: Arg{index}) -> Result{index}: ..."]
+    lines += ["", "", "def func(x: object) -> object:", "    return x"]
+    arguments = " | ".join(f"Arg{index}" for index in range(size))
+    results = " | ".join(f"Result{index}" for index in range(size))
+    lines += [
+        "",
+        "",
+        f"def call(x: {arguments}) -> {results}:",
+        "    return func(x)",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _typeddict(size: int) -> str:
+    # A TypedDict with extra keys is consistent with one with fewer keys,
+    # which is checked key by key.
+    lines = [
+        "from typing import Mapping, NotRequired, TypedDict",
+        "",
+        "",
+        "class Narrow(TypedDict):",
+    ]
+    lines += [f"    k{index}: int" for index in range(size)]
+    lines += ["    optional: NotRequired[str]", "", "", "class Wide(TypedDict):"]
+    lines += [f"    k{index}: int" for index in range(size)]
+    lines += ["    optional: NotRequired[str]", "    extra: str", ""]
+    items = ", ".join(f'"k{index}": {index}' for index in range(size))
+    lines += [
+        "",
+        f'wide: Wide = {{{items}, "extra": ""}}',
+        "narrow: Narrow = wide",
+        "mapping: Mapping[str, object] = wide",
+        "",
+        "",
+        "def accept(value: Narrow) -> None: ...",
+        "",
+        "",
+        "accept(wide)",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _protocols(size: int) -> str:
+    # Every class is matched against the protocol member by member.
+    lines = ["from typing import Protocol", "", "", "class Proto(Protocol):"]
+    for member in range(size):
+        lines += [f"    def method{member}(self, x: int) -> str: ..."]
+    for index in range(size):
+        lines += ["", "", f"class Impl{index}:"]
+        for member in range(size):
+            lines += [
+                f"    def method{member}(self, x: int) -> str:",
+                '        return ""',
+            ]
+    lines += ["", "", "def accept(value: Proto) -> None: ...", "", ""]
+    lines += [f"accept(Impl{index}())" for index in range(size)]
+    return "\n".join(lines) + "\n"
+
+
+# The largest number of branches in one if/elif chain. Python compiles each
+# elif as an if nested in the else of the previous one, and fails on chains
+# of about a thousand branches, so longer chains are split into several.
+_MAX_ELIF_CHAIN = 100
+
+
+def _narrowing_chain(conditions: list[str]) -> list[str]:
+    # Every branch returns, so each chain narrows the value for the next.
+    lines: list[str] = []
+    for index, condition in enumerate(conditions):
+        keyword = "elif" if index % _MAX_ELIF_CHAIN else "if"
+        lines += [f"    {keyword} {condition}:", f"        return {index}"]
+    return lines + ["    assert_never(value)"]
+
+
+def _enum_class(size: int) -> list[str]:
+    lines = ["class State(Enum):"]
+    lines += [f"    S{index} = {index}" for index in range(size)]
+    return lines
+
+
+def _literal_if_chain(size: int) -> str:
+    values = ", ".join(f'"v{index}"' for index in range(size))
+    lines = [
+        "from typing import Literal, assert_never",
+        "",
+        f"Value = Literal[{values}]",
+        "",
+        "",
+        "def check(value: Value) -> int:",
+    ]
+    lines += _narrowing_chain([f'value == "v{index}"' for index in range(size)])
+    return "\n".join(lines) + "\n"
+
+
+def _enum_if_chain(size: int) -> str:
+    lines = ["from enum import Enum", "from typing import assert_never", "", ""]
+    lines += _enum_class(size)
+    lines += ["", "", "def check(value: State) -> int:"]
+    lines += _narrowing_chain([f"value is State.S{index}" for index in range(size)])
+    return "\n".join(lines) + "\n"
+
+
+def _enum_match(size: int) -> str:
+    lines = ["from enum import Enum", "from typing import assert_never", "", ""]
+    lines += _enum_class(size)
+    lines += ["", "", "def check(value: State) -> int:", "    match value:"]
+    for index in range(size):
+        lines += [f"        case State.S{index}:", f"            return {index}"]
+    lines += ["        case _:", "            assert_never(value)"]
+    return "\n".join(lines) + "\n"
+
+
+def _typeis_chain(size: int) -> str:
+    lines = ["from typing import assert_never", "", "from typing_extensions import TypeIs"]
+    for index in range(size):
+        lines += ["", "", f"class Shape{index}: ..."]
+    for index in range(size):
+        lines += [
+            "",
+            "",
+            f"def is_shape{index}(value: object) -> TypeIs[Shape{index}]:",
+            f"    return isinstance(value, Shape{index})",
+        ]
+    shapes = " | ".join(f"Shape{index}" for index in range(size))
+    lines += ["", "", f"type Shape = {shapes}", "", "", "def check(value: Shape) -> int:"]
+    lines += _narrowing_chain([f"is_shape{index}(value)" for index in range(size)])
+    return "\n".join(lines) + "\n"
+
+
+# Narrowing is swept over unions as large as those of big state machines.
+_NARROWING_SIZES = (250, 500, 1000, 2000)
+
+
+def generate_overload_expansion(arguments: int, arms: int) -> str:
+    """
+    Returns a test file with an overload of `arms` signatures that differ
+    only in the type of their last parameter, called with `arguments`
+    arguments that are each a union of `arms` types. No signature accepts
+    the union, so the call only type checks once the last argument's union
+    is expanded. Type checkers that expand the arguments from left to
+    right, as the overload evaluation algorithm in the spec does, try up
+    to `arms ** arguments` combinations before they get there.
+    """
+    lines = ["from typing import overload"]
+    for arm in range(arms):
+        lines += ["", "", f"class Arg{arm}: ...", "", "", f"class Result{arm}: ..."]
+    leading = "".join(f"x{index}: object, " for index in range(arguments - 1))
+    for arm in range(arms):
+        lines += [
+            "",
+            "",
+            "@overload",
+            f"def func({leading}x{arguments - 1}: Arg{arm}) -> Result{arm}: ...",
+        ]
+    parameters = ", ".join(f"x{index}: object" for index in range(arguments))
+    lines += ["", "", f"def func({parameters}) -> object:", "    return x0"]
+    union = " | ".join(f"Arg{arm}" for arm in range(arms))
+    results = " | ".join(f"Result{arm}" for arm in range(arms))
+    call_parameters = ", ".join(f"x{index}: {union}" for index in range(arguments))
+    call_arguments = ", ".join(f"x{index}" for index in range(arguments))
+    lines += [
+        "",
+        "",
+        f"def call({call_parameters}) -> {results}:",
+        f"    return func({call_arguments})",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+# The kinds of protocols matched by the protocol matching benchmark. The
+# members of "generic" protocols take and return their type parameter, and
+# those of "recursive" protocols return the protocol itself.
+PROTOCOL_KINDS = ("generic", "recursive")
+
+
+def generate_protocol_matching(
+    kind: str, protocols: int, members: int, classes: int, sites: int
+) -> str:
+    """
+    Returns a test file with `protocols` generic protocols of `members`
+    methods each, and `classes` classes that implement all of them without
+    inheriting from them. An instance of every class is passed to a
+    function that accepts each protocol at `sites` call sites, so a type
+    checker that caches whether a class matches a protocol only matches
+    each pair once.
+    """
+    # The type parameter of a recursive protocol only appears in its
+    # parameters, so it must be contravariant.
+    if kind == "recursive":
+        type_var = 'T_contra = TypeVar("T_contra", contravariant=True)'
+    else:
+        type_var = 'T = TypeVar("T")'
+    param = type_var.partition(" ")[0]
+    lines = ["from typing import Protocol, TypeVar", "", type_var]
+    for protocol in range(protocols):
+        lines += ["", "", f"class Proto{protocol}(Protocol[{param}]):"]
+        result = f'"Proto{protocol}[{param}]"' if kind == "recursive" else param
+        for member in range(members):
+            lines += [f"    def p{protocol}_m{member}(self, x: {param}) -> {result}: ..."]
+    for index in range(classes):
+        lines += ["", "", f"class Impl{index}:"]
+        result, returned = (f'"Impl{index}"', "self") if kind == "recursive" else ("int", "x")
+        for protocol in range(protocols):
+            for member in range(members):
+                lines += [
+                    f"    def p{protocol}_m{member}(self, x: int) -> {result}:",
+                    f"        return {returned}",
+                ]
+    for protocol in range(protocols):
+        lines += ["", "", f"def accept{protocol}(value: Proto{protocol}[int]) -> None: ..."]
+    # The instances are made once, so that the sites only match them.
+    lines += ["", ""] + [f"impl{index} = Impl{index}()" for index in range(classes)]
+    for site in range(sites):
+        lines += ["", "", f"def site{site}() -> None:"]
+        lines += [
+            f"    accept{protocol}(impl{index})"
+            for index in range(classes)
+            for protocol in range(protocols)
+        ]
+    return "\n".join(lines) + "\n"
+
+
+# The ways of spelling a recursive JSON type alias, and their definitions.
+RECURSIVE_ALIAS_FORMS: Mapping[str, str] = {
+    "type-statement": (
+        "type Json = int | float | str | bool | None | list[Json] | dict[str, Json]\n"
+    ),
+    "type-alias-type": (
+        "from typing import TypeAliasType\n"
+        "\n"
+        "Json = TypeAliasType(\n"
+        '    "Json", "int | float | str | bool | None | list[Json] | dict[str, Json]"\n'
+        ")\n"
+    ),
+    "forward-reference": (
+        "from typing import TypeAlias, Union\n"
+        "\n"
+        'Json: TypeAlias = Union[int, float, str, bool, None, list["Json"], dict[str, "Json"]]\n'
+    ),
+}
+
+# The leaves of the generated JSON values, which cover each scalar member
+# of the alias.
+_JSON_SCALARS = ("1", '"text"', "1.5", "True", "None")
+
+
+def generate_recursive_alias(form: str, depth: int, width: int) -> str:
+    """
+    Returns a test file that assigns a JSON-like value nested `depth`
+    levels deep to a recursive type alias spelled in the given form. The
+    levels alternate between dicts and lists of `width` items, of which
+    the first holds the next level and the rest are scalars.
+    """
+    value = _JSON_SCALARS[0]
+    for level in reversed(range(depth)):
+        items = [value] + [
+            _JSON_SCALARS[index % len(_JSON_SCALARS)] for index in range(1, width)
+        ]
+        if level % 2:
+            value = "[" + ", ".join(items) + "]"
+        else:
+            entries = (f'"k{index}": {item}' for index, item in enumerate(items))
+            value = "{" + ", ".join(entries) + "}"
+    return f"{RECURSIVE_ALIAS_FORMS[form]}\n\nvalue: Json = {value}\n"
+
+
+STRESS_FEATURES: Mapping[str, StressFeature] = {
+    feature.name: feature
+    for feature in (
+        StressFeature(
+            "literal-match",
+            "a union of N literals narrowed case by case by match",
+            _literal_match,
+        ),
+        StressFeature(
+            "overloads",
+            "an overload with N signatures called with a union of N types",
+            _overloads,
+        ),
+        StressFeature(
+            "typeddict",
+            "TypedDicts with N keys checked for consistency",
+            _typeddict,
+        ),
+        StressFeature(
+            "protocols",
+            "a protocol with N members matched against N classes",
+            _protocols,
+        ),
+        StressFeature(
+            "literal-if-chain",
+            "a union of N literals narrowed by == in if/elif chains",
+            _literal_if_chain,
+            _NARROWING_SIZES,
+        ),
+        StressFeature(
+            "enum-if-chain",
+            "an enum of N members narrowed by is in if/elif chains",
+            _enum_if_chain,
+            _NARROWING_SIZES,
+        ),
+        StressFeature(
+            "enum-match",
+            "an enum of N members narrowed case by case by match",
+            _enum_match,
+            _NARROWING_SIZES,
+        ),
+        StressFeature(
+            "typeis-chain",
+            "a union of N classes narrowed by TypeIs functions in if/elif chains",
+            _typeis_chain,
+            _NARROWING_SIZES,
+        ),
+    )
+}
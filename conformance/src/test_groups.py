@@ -3,6 +3,8 @@ Reads a template file that describes groups of tests in the
 conformance test suite.
 """
 
+import ast
+import functools
 import tomllib
 
 from dataclasses import dataclass
@@ -45,3 +47,73 @@ def get_test_cases(
     ]
 
     return test_cases
+
+
+def get_test_shards(
+    test_cases: Sequence[Path], shards: int
+) -> Sequence[Sequence[Path]]:
+    """
+    Splits test cases into at most `shards` groups with roughly equal
+    total file sizes.
+    """
+    shard_count = max(1, min(shards, len(test_cases)))
+    test_shards: list[list[Path]] = [[] for _ in range(shard_count)]
+    shard_sizes = [0] * shard_count
+
+    # Assign the largest files first, each one to the smallest shard so far.
+    for test_case in sorted(
+        test_cases, key=lambda p: p.stat().st_size, reverse=True
+    ):
+        index = shard_sizes.index(min(shard_sizes))
+        test_shards[index].append(test_case)
+        shard_sizes[index] += test_case.stat().st_size
+
+    return test_shards
+
+
+def get_test_dependencies(test_case: Path) -> Sequence[Path]:
+    """
+    Returns the modules and stubs next to the test case that it imports,
+    directly or indirectly.
+    """
+    tests_dir = test_case.parent
+    dependencies: list[Path] = []
+    pending = [test_case]
+    seen = {test_case}
+
+    while pending:
+        source = pending.pop()
+        for module_name in _get_imported_modules(source):
+            for suffix in (".py", ".pyi"):
+                path = tests_dir / f"{module_name}{suffix}"
+                if path not in seen and path.is_file():
+                    seen.add(path)
+                    dependencies.append(path)
+                    pending.append(path)
+
+    return sorted(dependencies)
+
+
+def _get_imported_modules(source: Path) -> frozenset[str]:
+    return _parse_imported_modules(source, source.stat().st_mtime_ns)
+
+
+# Keyed by modification time so repeated lookups (e.g. in watch mode) only
+# re-parse files that have changed.
+@functools.lru_cache(maxsize=None)
+def _parse_imported_modules(source: Path, mtime_ns: int) -> frozenset[str]:
+    try:
+        tree = ast.parse(source.read_bytes(), filename=str(source))
+    except SyntaxError:
+        return frozenset()
+
+    module_names: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            module_names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.module and not node.level:
+                module_names.add(node.module.split(".")[0])
+            else:
+                module_names.update(alias.name for alias in node.names)
+    return frozenset(module_names)
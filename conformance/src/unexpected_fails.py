@@ -13,7 +13,7 @@ results_dir = Path(__file__).resolve().parent.parent / "results"
 for type_checker_dir in sorted(results_dir.iterdir()):
     if type_checker_dir.is_dir():
         for file in sorted(type_checker_dir.iterdir()):
-            if file.name == "version.toml":
+            if file.name in ("version.toml", "perf.toml"):
                 continue
             with file.open("rb") as f:
                 try:
@@ -13,6 +13,7 @@ ALLOWED_RESULT_KEYS = frozenset(
         "conformant",
         "errors_diff",
         "ignore_errors",
+        "limit_exceeded",
         "notes",
         "output",
     }
@@ -28,7 +29,7 @@ def main() -> int:
         if not type_checker_dir.is_dir():
             continue
         for file in sorted(type_checker_dir.iterdir()):
-            if file.name == "version.toml":
+            if file.name in ("version.toml", "perf.toml"):
                 continue
             checked += 1
             try:
@@ -60,6 +61,12 @@ def _validate_result(file: Path, results_dir: Path, info: dict[str, Any]) -> lis
             f"{rel_path}: unrecognized key(s): {', '.join(repr(key) for key in unknown_keys)}"
         )
 
+    limit_exceeded = info.get("limit_exceeded")
+    if limit_exceeded is not None and limit_exceeded not in ("timeout", "oom"):
+        issues.append(
+            f"{rel_path}: limit_exceeded must be 'timeout' or 'oom' (got {limit_exceeded!r})"
+        )
+
     automated = info.get("conformance_automated")
     if automated not in {"Pass", "Fail"}:
         issues.append(